@@ -1,19 +1,39 @@
 from langchain_core.messages import HumanMessage
-from langchain_mcp_adapters.client import MultiServerMCPClient
 from langchain_core.runnables import RunnableLambda
 from langgraph.prebuilt import create_react_agent
 from langgraph.graph import StateGraph, START, END
-from langchain_google_genai import ChatGoogleGenerativeAI
 
 from typing import TypedDict
-import base64
-from io import BytesIO
 from PIL import Image
+import argparse
 import asyncio
 import tkinter as tk
 from tkinter import filedialog
 import os
-import time
+
+from blender_pool import BlenderPool, uses_blender, leased_session
+from llm_stream import stream_llm
+from response_cache import response_cache
+from vision_cache import vision_cache, scope, dhash
+from blender_render import take_screenshot
+from image_prep import prepare_image, print_image_stats
+from asset_cache import asset_cache
+from asset_prefetch import asset_prefetcher
+from image_similarity import similarity_gate
+from feedback_loop import loop_step, route, finish_step
+from loop_controller import SCORE_INSTRUCTION
+from state_compaction import compacted
+from usage_tracker import metered
+from tracing import tracer, traced
+from run_store import run_store, new_run_id
+from llm_pool import gemini_chat
+
+# Blender Workers, Started Once In main()
+blender_pool = BlenderPool.from_env()
+
+# Cache Responses Of The First-Pass Gemini Node, Sampled (Temperature > 0) Calls Only With LLM_CACHE_SAMPLED=1
+response_cache.enable("gemini_llm")
+
 
 class InputApp(tk.Tk):
     def __init__(self):
@@ -71,9 +91,20 @@ class MyState(TypedDict):
 
     # Pass States Through Stategraph
     filepath_1: str
-    filepath_2: str
     userinput: str
     vision: str
+    feedback: str
+    preview: bool
+    render: str
+    previous_render: str
+    skip_reason: str
+    stop_reason: str
+    checkpoint_dir: str
+    checkpoint: str
+    checkpoints: list
+    iterations: int
+    loop: dict
+    run_id: str
 
 
 def prompt_func(data):
@@ -81,10 +112,11 @@ def prompt_func(data):
     # Chain Image And Text Data
     text = data["text"]
     image = data["image"]
+    mime = data.get("mime", "image/png")
 
     image_part = {
         "type": "image_url",
-        "image_url": f"data:image/png;base64,{image}",
+        "image_url": f"data:{mime};base64,{image}",
     }
 
     content_parts = []
@@ -97,22 +129,14 @@ def prompt_func(data):
     return [HumanMessage(content=content_parts)]
 
 
-def convert_to_base64(pil_image):
-
-    # Convert PIL Images To Base64 Encoded Strings
-    buffered = BytesIO()
-    pil_image.save(buffered, format="PNG")
-    img_str = base64.b64encode(buffered.getvalue()).decode("utf-8")
-    return img_str
-
-
+@uses_blender
 async def llm_func(state):
     user_input = state["userinput"]
 
     if user_input == "":
-        file_path_2 = state["filepath_2"]
+        render_b64 = state.get("render", "")
 
-        if file_path_2 == "":
+        if render_b64 == "":
             # Get Image Data
             file_path_1 = state["filepath_1"]
 
@@ -124,43 +148,17 @@ async def llm_func(state):
                 print(f"Error in main execution: {e}")
 
 
-            image_b64_1= convert_to_base64(pil_image)
-
-
-            # Get MCP-Tools From Server
-            client = MultiServerMCPClient(
-                {
-                    "blender_mcp": {
-                        "command": "uvx",
-                        "args": ["blender-mcp"],
-                        "transport": "stdio",
-                    }
-                }
-            )
-            try:
-
-                tools = await client.get_tools()
-
-            except Exception as e:
-                print(f"Error in main execution: {e}")
-
 
-            # Filter The Tools
-            filtered_tools = [t for t in tools if t.name not in {"get_hyper3d_status", "get_sketchfab_status", "search_sketchfab_models","download_sketchfab_models","generate_hyper3d_model_via_text","generate_hyper3d_model_via_images","poll_rodin_job_status","import_generated_asset"}]
+            # Get MCP-Tools From The Leased Blender Worker
+            session = leased_session()
+            filtered_tools = await session.get_tools()
 
 
             # Create LLM Agent
             if "GOOGLE_API_KEY" not in os.environ:
                 os.environ["GOOGLE_API_KEY"] = API_KEY
             
-            llm_chat = ChatGoogleGenerativeAI(
-                model="gemini-2.5-flash",
-                temperature=0,
-                max_tokens=10000,
-                timeout=None,
-                max_retries=2,
-                # other params...
-            )
+            llm_chat = gemini_chat(model="gemini-2.5-flash", temperature=0, max_tokens=10000)
 
 
             # Prepare Image Chain
@@ -173,19 +171,25 @@ async def llm_func(state):
                 Provide a detailed and extensive description of the image. List all assets like hdris, models and textures you need to create it.
             """
 
+            # Reuse The Description Of A Near-Duplicate Reference Image
+            vision_scope = scope(llm_chat, full_prompt)
+            image_hash = dhash(pil_image)
+            vision_result = vision_cache.lookup(image_hash, vision_scope)
+
             # Get Agent Chain Result
-            vision_result = chain.invoke({
-                "text": full_prompt,
-                "image": image_b64_1,
-            })
-
-            # Ouput Image LLM
-            print("\n")
-            print("ImageLLM Output:")
-            print("\n")
-            print(vision_result.content)
-            print("\n")
-            state["vision"] = str(vision_result.content)
+            if vision_result is None:
+                image_b64_1, image_mime = prepare_image(pil_image, llm_chat)
+                vision_result = await stream_llm(chain, {
+                    "text": full_prompt,
+                    "image": image_b64_1,
+                    "mime": image_mime,
+                }, "ImageLLM", cache_node="gemini_llm")
+                vision_cache.store(image_hash, vision_scope, vision_result)
+
+            state["vision"] = vision_result
+
+            # Start Fetching The Listed Assets While The Next Nodes Run
+            asset_prefetcher.start(vision_result)
 
             # Prepare React Agent
             agent = create_react_agent(
@@ -204,7 +208,7 @@ async def llm_func(state):
                 print("Agent Output:\n")
                 await agent.ainvoke({
                     "messages": [
-                        {"role": "user", "content": full_prompt+(vision_result.content)}
+                        {"role": "user", "content": full_prompt+(vision_result)}
                     ]
                 })
 
@@ -213,83 +217,43 @@ async def llm_func(state):
 
             
 
-            # Make Viewport Screenshot
-            screenshot_code = """
-                import bpy
-
-                # Create a new camera object
-                cam_data = bpy.data.cameras.new(name="MyCamera")
-                cam_object = bpy.data.objects.new("MyCamera", cam_data)
-
-                # Set camera location and rotation
-                cam_object.location = (0, -10, 7)
-                cam_object.rotation_euler = (1.1, 0, 0)
-
-                # Link the camera to the current scene
-                bpy.context.collection.objects.link(cam_object)
-
-                # Set the new camera as the active camera
-                bpy.context.scene.camera = cam_object
-
-                bpy.context.scene.render.filepath = "C:\\Users\\cross\\Desktop\\Render.png"
-                bpy.ops.render.render(write_still=True)
-
-                """
-            try:
-                await agent.ainvoke(
-                    {"messages": [{"role": "user", "content": "Execute the following Blender Python Code:\n"+screenshot_code+
-                    "\nIf it does not work try to create a camera and reexecute it."}]}
-                )
-                print("Screenshot taken.")
-            except Exception as e:
-                print(f"Error in main execution: {e}")
+            # Make Viewport Screenshot With A Direct Tool Call
+            state["render"] = await take_screenshot(session, agent, "If it does not work try to create a camera and reexecute it.", preview=state.get("preview", False))
 
 
             return state
         
         else:
-            # Get Image Data
-            try:
-                pil_image = Image.open(file_path_2)
-
-            except Exception as e:
-                print(f"Error in main execution: {e}")
-
-
-            image_b64_2= convert_to_base64(pil_image)
-
-            # Get MCP-Tools From Server
-            client = MultiServerMCPClient(
-                {
-                    "blender_mcp": {
-                        "command": "uvx",
-                        "args": ["blender-mcp"],
-                        "transport": "stdio",
-                    }
-                }
-            )
-            try:
 
-                tools = await client.get_tools()
-
-            except Exception as e:
-                print(f"Error in main execution: {e}")
-
-            # Filter The Tools
-            filtered_tools = [t for t in tools if t.name not in {"get_hyper3d_status", "get_sketchfab_status", "search_sketchfab_models","download_sketchfab_models","generate_hyper3d_model_via_text","generate_hyper3d_model_via_images","poll_rodin_job_status","import_generated_asset"}]
+            # Get MCP-Tools From The Leased Blender Worker
+            session = leased_session()
+            filtered_tools = await session.get_tools()
 
             # Create Tool Agent
             if "GOOGLE_API_KEY" not in os.environ:
                 os.environ["GOOGLE_API_KEY"] = API_KEY
             
-            llm_chat = ChatGoogleGenerativeAI(
-                model="gemini-2.5-flash",
-                temperature=0,
-                max_tokens=10000,
-                timeout=None,
-                max_retries=2,
-                # other params...
-            )
+            llm_chat = gemini_chat(model="gemini-2.5-flash", temperature=0, max_tokens=10000)
+
+            # Skip The LLM Calls When The Render Barely Changed Or Already Matches The Reference
+            skip_reason = similarity_gate.check(render_b64, state.get("previous_render", ""), state["filepath_1"])
+            state["previous_render"] = render_b64
+            state["skip_reason"] = skip_reason or ""
+            if skip_reason:
+                print(f"Skipping feedback iteration: {skip_reason}")
+
+                # Only The Final Full-Quality Render Is Still Needed
+                if not state.get("preview", False):
+                    agent = create_react_agent(
+                        model = llm_chat,
+                        tools=filtered_tools,
+                    )
+                    state["render"] = await take_screenshot(session, agent, "If it does not work try to create a camera and reexecute it.", preview=False)
+
+                return state
+
+            # Prepare The Render Handed Back By The Previous Iteration
+            image_b64_2, image_mime = prepare_image(render_b64, llm_chat, render=True)
 
                     # Prepare Image Chain
             prompt_func_runnable = RunnableLambda(prompt_func)
@@ -299,20 +263,17 @@ async def llm_func(state):
             full_prompt = f"""
                 You are an expert in image analysis, 3D modeling, and Blender scripting. 
                 Provide a detailed and extensive comparison of the image and the discription.
-            """
+            """ + SCORE_INSTRUCTION
             
             # Get Agent Chain Result
-            vision_result = chain.invoke({
+            vision_result = await stream_llm(chain, {
                 "text": full_prompt+state["vision"],
                 "image": image_b64_2,
-            })
+                "mime": image_mime,
+            }, "ImageLLM")
 
-            # Ouput Image LLM
-            print("\n")
-            print("ImageLLM Output:")
-            print("\n")
-            print(vision_result.content)
-            print("\n")
+            # The Description Stays The Reference, The Loop Controller Reads The Score From The Comparison
+            state["feedback"] = vision_result
 
             # Prepare React Agent
             agent = create_react_agent(
@@ -331,7 +292,7 @@ async def llm_func(state):
                 print("Agent Output:\n")
                 await agent.ainvoke({
                     "messages": [
-                        {"role": "user", "content": full_prompt+(vision_result.content)}
+                        {"role": "user", "content": full_prompt+(vision_result)}
                     ]
                 })
 
@@ -340,78 +301,26 @@ async def llm_func(state):
             
 
 
-            # Make Viewport Screenshot
-            screenshot_code = """
-                import bpy
-
-                # Create a new camera object
-                cam_data = bpy.data.cameras.new(name="MyCamera")
-                cam_object = bpy.data.objects.new("MyCamera", cam_data)
-
-                # Set camera location and rotation
-                cam_object.location = (0, -10, 7)
-                cam_object.rotation_euler = (1.1, 0, 0)
-
-                # Link the camera to the current scene
-                bpy.context.collection.objects.link(cam_object)
-
-                # Set the new camera as the active camera
-                bpy.context.scene.camera = cam_object
-
-                bpy.context.scene.render.filepath = "C:\\Users\\cross\\Desktop\\Render.png"
-                bpy.ops.render.render(write_still=True)
-
-                """
-            try:
-                await agent.ainvoke(
-                    {"messages": [{"role": "user", "content": "Execute the following Blender Python Code:\n"+screenshot_code+
-                    "\nIf it does not work try to create a camera and reexecute it."}]}
-                )
-                print("Screenshot taken.")
-            except Exception as e:
-                print(f"Error in main execution: {e}")
+            # Make Viewport Screenshot With A Direct Tool Call
+            state["render"] = await take_screenshot(session, agent, "If it does not work try to create a camera and reexecute it.", preview=state.get("preview", False))
 
 
             return state
     else:
-        file_path_2 = state["filepath_2"]
+        render_b64 = state.get("render", "")
 
-        if file_path_2 == "":
+        if render_b64 == "":
             
-            # Get MCP-Tools From Server
-            client = MultiServerMCPClient(
-                {
-                    "blender_mcp": {
-                        "command": "uvx",
-                        "args": ["blender-mcp"],
-                        "transport": "stdio",
-                    }
-                }
-            )
-            try:
-
-                tools = await client.get_tools()
-
-            except Exception as e:
-                print(f"Error in main execution: {e}")
-
-
-            # Filter The Tools
-            filtered_tools = [t for t in tools if t.name not in {"get_hyper3d_status", "get_sketchfab_status", "search_sketchfab_models","download_sketchfab_models","generate_hyper3d_model_via_text","generate_hyper3d_model_via_images","poll_rodin_job_status","import_generated_asset"}]
+            # Get MCP-Tools From The Leased Blender Worker
+            session = leased_session()
+            filtered_tools = await session.get_tools()
 
 
             # Create LLM Agent
             if "GOOGLE_API_KEY" not in os.environ:
                 os.environ["GOOGLE_API_KEY"] = API_KEY
             
-            llm_chat = ChatGoogleGenerativeAI(
-                model="gemini-2.5-flash",
-                temperature=0,
-                max_tokens=10000,
-                timeout=None,
-                max_retries=2,
-                # other params...
-            )
+            llm_chat = gemini_chat(model="gemini-2.5-flash", temperature=0, max_tokens=10000)
 
             # Create Full Prompt
             full_prompt = f"""
@@ -420,15 +329,12 @@ async def llm_func(state):
             """
 
             # Get Agent Chain Result
-            vision_result = llm_chat.invoke(full_prompt+user_input)
+            vision_result = await stream_llm(llm_chat, full_prompt+user_input, "ImageLLM", cache_node="gemini_llm")
 
-            # Ouput Image LLM
-            print("\n")
-            print("ImageLLM Output:")
-            print("\n")
-            print(vision_result.content)
-            print("\n")
-            state["vision"] = vision_result.content
+            state["vision"] = vision_result
+
+            # Start Fetching The Listed Assets While The Next Nodes Run
+            asset_prefetcher.start(vision_result)
 
             # Prepare React Agent
             agent = create_react_agent(
@@ -456,84 +362,44 @@ async def llm_func(state):
 
             
 
-            # Make Viewport Screenshot
-            screenshot_code = """
-                import bpy
-
-                # Create a new camera object
-                cam_data = bpy.data.cameras.new(name="MyCamera")
-                cam_object = bpy.data.objects.new("MyCamera", cam_data)
-
-                # Set camera location and rotation
-                cam_object.location = (0, -10, 7)
-                cam_object.rotation_euler = (1.1, 0, 0)
-
-                # Link the camera to the current scene
-                bpy.context.collection.objects.link(cam_object)
-
-                # Set the new camera as the active camera
-                bpy.context.scene.camera = cam_object
-
-                bpy.context.scene.render.filepath = "C:\\Users\\cross\\Desktop\\Render.png"
-                bpy.ops.render.render(write_still=True)
-
-                """
-            try:
-                await agent.ainvoke(
-                    {"messages": [{"role": "user", "content": "Execute the following Blender Python Code:\n"+screenshot_code+
-                    "\nIf it does not work try to create a camera and reexecute it."}]}
-                )
-                print("Screenshot taken.")
-            except Exception as e:
-                print(f"Error in main execution: {e}")
+            # Make Viewport Screenshot With A Direct Tool Call
+            state["render"] = await take_screenshot(session, agent, "If it does not work try to create a camera and reexecute it.", preview=state.get("preview", False))
 
 
             return state
         
         else:
-            # Get Image Data
-            try:
-                pil_image = Image.open(file_path_2)
-
-            except Exception as e:
-                print(f"Error in main execution: {e}")
-
-
-            image_b64_2= convert_to_base64(pil_image)
-
-            # Get MCP-Tools From Server
-            client = MultiServerMCPClient(
-                {
-                    "blender_mcp": {
-                        "command": "uvx",
-                        "args": ["blender-mcp"],
-                        "transport": "stdio",
-                    }
-                }
-            )
-            try:
-
-                tools = await client.get_tools()
 
-            except Exception as e:
-                print(f"Error in main execution: {e}")
-
-            # Filter The Tools
-            filtered_tools = [t for t in tools if t.name not in {"get_hyper3d_status", "get_sketchfab_status", "search_sketchfab_models","download_sketchfab_models","generate_hyper3d_model_via_text","generate_hyper3d_model_via_images","poll_rodin_job_status","import_generated_asset"}]
+            # Get MCP-Tools From The Leased Blender Worker
+            session = leased_session()
+            filtered_tools = await session.get_tools()
 
         
             # Create Tool Agent
             if "GOOGLE_API_KEY" not in os.environ:
                 os.environ["GOOGLE_API_KEY"] = API_KEY
             
-            llm_chat = ChatGoogleGenerativeAI(
-                model="gemini-2.5-flash",
-                temperature=0,
-                max_tokens=10000,
-                timeout=None,
-                max_retries=2,
-                # other params...
-            )
+            llm_chat = gemini_chat(model="gemini-2.5-flash", temperature=0, max_tokens=10000)
+
+            # Skip The LLM Calls When The Render Barely Changed Or Already Matches The Reference
+            skip_reason = similarity_gate.check(render_b64, state.get("previous_render", ""), state["filepath_1"])
+            state["previous_render"] = render_b64
+            state["skip_reason"] = skip_reason or ""
+            if skip_reason:
+                print(f"Skipping feedback iteration: {skip_reason}")
+
+                # Only The Final Full-Quality Render Is Still Needed
+                if not state.get("preview", False):
+                    agent = create_react_agent(
+                        model = llm_chat,
+                        tools=filtered_tools,
+                    )
+                    state["render"] = await take_screenshot(session, agent, "If it does not work try to create a camera and reexecute it.", preview=False)
+
+                return state
+
+            # Prepare The Render Handed Back By The Previous Iteration
+            image_b64_2, image_mime = prepare_image(render_b64, llm_chat, render=True)
 
                     # Prepare Image Chain
             prompt_func_runnable = RunnableLambda(prompt_func)
@@ -543,20 +409,17 @@ async def llm_func(state):
             full_prompt = f"""
                 You are an expert in image analysis, 3D modeling, and Blender scripting. 
                 Provide a detailed and extensive comparison of the image and the discription.
-            """
+            """ + SCORE_INSTRUCTION
             
             # Get Agent Chain Result
-            vision_result = chain.invoke({
+            vision_result = await stream_llm(chain, {
                 "text": full_prompt+state["vision"],
                 "image": image_b64_2,
-            })
+                "mime": image_mime,
+            }, "ImageLLM")
 
-            # Ouput Image LLM
-            print("\n")
-            print("ImageLLM Output:")
-            print("\n")
-            print(vision_result.content)
-            print("\n")
+            # The Description Stays The Reference, The Loop Controller Reads The Score From The Comparison
+            state["feedback"] = vision_result
 
             # Prepare React Agent
             agent = create_react_agent(
@@ -575,7 +438,7 @@ async def llm_func(state):
                 print("Agent Output:\n")
                 await agent.ainvoke({
                     "messages": [
-                        {"role": "user", "content": full_prompt+(vision_result.content)}
+                        {"role": "user", "content": full_prompt+(vision_result)}
                     ]
                 })
 
@@ -584,96 +447,103 @@ async def llm_func(state):
             
 
 
-            # Make Viewport Screenshot
-            screenshot_code = """
-                import bpy
+            # Make Viewport Screenshot With A Direct Tool Call
+            state["render"] = await take_screenshot(session, agent, "If it does not work try to create a camera and reexecute it.", preview=state.get("preview", False))
 
-                # Create a new camera object
-                cam_data = bpy.data.cameras.new(name="MyCamera")
-                cam_object = bpy.data.objects.new("MyCamera", cam_data)
 
-                # Set camera location and rotation
-                cam_object.location = (0, -10, 7)
-                cam_object.rotation_euler = (1.1, 0, 0)
+            return state
 
-                # Link the camera to the current scene
-                bpy.context.collection.objects.link(cam_object)
 
-                # Set the new camera as the active camera
-                bpy.context.scene.camera = cam_object
 
-                bpy.context.scene.render.filepath = "C:\\Users\\cross\\Desktop\\Render.png"
-                bpy.ops.render.render(write_still=True)
+async def loop_node(state):
+    print({k: v for k, v in state.items() if k not in ("render", "previous_render")})
+    return await loop_step(state, state["filepath_1"], "Rendering Loop")
 
-                """
-            try:
-                await agent.ainvoke(
-                    {"messages": [{"role": "user", "content": "Execute the following Blender Python Code:\n"+screenshot_code+
-                    "\nIf it does not work try to create a camera and reexecute it."}]}
-                )
-                print("Screenshot taken.")
-            except Exception as e:
-                print(f"Error in main execution: {e}")
 
+async def finish_node(state):
+    return await finish_step(state, state["filepath_1"])
 
-            return state
 
+def build_graph():
+
+    # One Cyclic Graph: The First Pass, Then Feedback Iterations Until The Loop Controller Stops
+    graph = StateGraph(MyState)
+    graph.add_node("gemini_llm", traced("gemini_llm", metered("gemini_llm", compacted("gemini_llm", llm_func))))
+    graph.add_node("loop", traced("loop", loop_node))
+    graph.add_node("finish", traced("finish", finish_node))
+    graph.add_edge(START, "gemini_llm")
+    graph.add_edge("gemini_llm", "loop")
+    graph.add_conditional_edges("loop", route, {"again": "gemini_llm", "finish": "finish"})
+    graph.add_edge("finish", END)
+    return graph
+
+
+async def run_pipeline(user_input, file_path, preview=True, run_id=None):
+
+    # Every Finished Node Is Saved, --resume Continues A Crashed Run From There
+    run_id = run_id or new_run_id()
+    print(f"Run id: {run_id}")
+
+    # Compiled Once Per Process And Shared By Every Run And Job
+    graph = await run_store.graph(__name__, build_graph)
+
+    input_state = MyState(filepath_1=file_path,userinput=user_input,vision="",preview=preview,run_id=run_id)
+    return await run_store.run(graph, input_state, run_id)
 
 
 async def main():
 
-    # Open Input Window
-    app = InputApp()
-    app.mainloop()
+    parser = argparse.ArgumentParser(description="Recreate a scene in Blender from a prompt or an image.")
+    parser.add_argument("--resume", metavar="RUN_ID", help="Continue a crashed or interrupted run from its last finished node")
+    args = parser.parse_args()
 
-    # Output Collected Inputs In Terminal
-    print("Inputs collected:")
-    print("llm_prompt =", app.user_input)
-    print("selected_file_path =", app.selected_file_path)
-    file_path = app.selected_file_path
-    user_input = app.user_input
+    if args.resume:
 
-    # Loop Until At Least One Input Collected
-    while file_path == "" and user_input == "":
+        # Take The Inputs From The Saved Run Instead Of Asking Again
+        inputs = await run_store.inputs(args.resume)
+        user_input = inputs.get("userinput", "")
+        file_path = inputs.get("filepath_1", "")
+        print("Resuming run", args.resume)
+
+    else:
+        # Open Input Window
         app = InputApp()
         app.mainloop()
+
+        # Output Collected Inputs In Terminal
         print("Inputs collected:")
         print("llm_prompt =", app.user_input)
         print("selected_file_path =", app.selected_file_path)
         file_path = app.selected_file_path
         user_input = app.user_input
 
-
-    # Create StateGraph With Nodes And Edges
-    graph = StateGraph(MyState)
-    graph.add_node("gemini_llm",llm_func)
-    graph.add_edge(START,"gemini_llm")
-    graph.add_edge("gemini_llm",END)
-    graph = graph.compile()
-
-    # Get StateGraph Output State
-    input_state = MyState(filepath_1=file_path,filepath_2="",userinput=user_input,vision="")
-    output_state = await graph.ainvoke(input_state, config={"recursion_limit": 150})
-
-    time.sleep(10)
-    # Prepare Rendering Loop
-    file_path_loop = "C:\\Users\\cross\\Desktop\\Render.png"
-    output_state["filepath_2"] = file_path_loop
-    input_state = output_state
-
-    time.sleep(10)
-
-    # Start Rendering Loop
-    for i in range(4):
-        print("\n")
-        print(f"+++++++++++++++++++++++++++++++")
-        print(f"+ Rendering Loop iteration: {str(i+2)} +")
-        print(f"+++++++++++++++++++++++++++++++")
-        print("\n")
-        time.sleep(10)
-        output_state = await graph.ainvoke(input_state, config={"recursion_limit": 150})
-        print(output_state)
-        input_state = output_state
+        # Loop Until At Least One Input Collected
+        while file_path == "" and user_input == "":
+            app = InputApp()
+            app.mainloop()
+            print("Inputs collected:")
+            print("llm_prompt =", app.user_input)
+            print("selected_file_path =", app.selected_file_path)
+            file_path = app.selected_file_path
+            user_input = app.user_input
+
+
+    # Start Blender Workers Once For All Iterations
+    await blender_pool.start()
+
+    try:
+        # Keep The Whole Run On One Worker, Other Workers Stay Free For Code Candidates
+        async with blender_pool.lease():
+            await run_pipeline(user_input, file_path, run_id=args.resume)
+
+    finally:
+        await asset_prefetcher.close()
+        await tracer.close()
+        await blender_pool.close()
+        response_cache.print_stats()
+        print_image_stats()
+        asset_cache.print_stats()
+        await run_store.close()
 
 
 if __name__ == "__main__":
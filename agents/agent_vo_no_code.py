@@ -1,20 +1,40 @@
 from langchain_core.messages import HumanMessage
 from langchain_core.messages import AIMessage
-from langchain_ollama import ChatOllama
-from langchain_mcp_adapters.client import MultiServerMCPClient
 from langchain_core.runnables import RunnableLambda
 from langgraph.prebuilt import create_react_agent
 from langgraph.graph import StateGraph, START, END
 
 from typing import TypedDict
-import base64
-from io import BytesIO
 from PIL import Image
+import argparse
 import asyncio
 import tkinter as tk
 from tkinter import filedialog
 import re
 
+from blender_pool import BlenderPool, uses_blender, leased_session
+from llm_stream import stream_llm
+from response_cache import response_cache
+from vision_cache import vision_cache, scope, dhash
+from blender_render import take_screenshot
+from image_prep import prepare_image, print_image_stats
+from asset_cache import asset_cache
+from asset_prefetch import asset_prefetcher
+from image_similarity import similarity_gate
+from feedback_loop import loop_step, route, finish_step
+from loop_controller import SCORE_INSTRUCTION
+from state_compaction import compacted
+from usage_tracker import metered
+from tracing import tracer, traced
+from run_store import run_store, new_run_id
+from llm_pool import ollama_chat
+
+# Blender Workers, Started Once In main()
+blender_pool = BlenderPool.from_env()
+
+# Cache Responses Of The First-Pass Vision And Plan Nodes, Sampled (Temperature > 0) Calls Only With LLM_CACHE_SAMPLED=1
+response_cache.enable("vision_llm", "plan_llm")
+
 
 class InputApp(tk.Tk):
     def __init__(self):
@@ -76,6 +96,17 @@ class MyState(TypedDict):
     filepath: str
     userinput: str
     error: str
+    preview: bool
+    render: str
+    previous_render: str
+    skip_reason: str
+    stop_reason: str
+    checkpoint_dir: str
+    checkpoint: str
+    checkpoints: list
+    iterations: int
+    loop: dict
+    run_id: str
 
 
 def prompt_func(data):
@@ -83,10 +114,11 @@ def prompt_func(data):
     # Chain Image And Text Data
     text = data["text"]
     image = data["image"]
+    mime = data.get("mime", "image/png")
 
     image_part = {
         "type": "image_url",
-        "image_url": f"data:image/png;base64,{image}",
+        "image_url": f"data:{mime};base64,{image}",
     }
 
     content_parts = []
@@ -99,40 +131,23 @@ def prompt_func(data):
     return [HumanMessage(content=content_parts)]
 
 
-def convert_to_base64(pil_image):
-
-    # Convert PIL Images To Base64 Encoded Strings
-    buffered = BytesIO()
-    pil_image.save(buffered, format="PNG")
-    img_str = base64.b64encode(buffered.getvalue()).decode("utf-8")
-    return img_str
-
-
 async def vision_llm_func(state: MyState) -> MyState:
 
     # Get Image Data
     file_path = state["filepath"]
     if file_path == "":
         # Create Vision Agent Chain
-        vision_llm_chat = ChatOllama(
-            model="llama4:maverick",
-            base_url="http://localhost:11434",
-            temperature=0.5,
-        )
+        vision_llm_chat = ollama_chat(model="llama4:maverick", temperature=0.5, base_url="http://localhost:11434")
 
         # Get Agent Result
         prompt = """You are an expert in image analysis, 3D modeling, and Blender scripting. 
             Provide a detailed and extensive description of the scene and list all assets including hdri, models and textures you will need to create it."""+state["userinput"]
-        vision_result = vision_llm_chat.invoke(prompt)
+        vision_result = await stream_llm(vision_llm_chat, prompt, "ImageLLM", cache_node="vision_llm")
 
-        # Ouput Image LLM
-        print("\n")
-        print("ImageLLM Output:")
-        print("\n")
-        print(vision_result.content)
-        print("\n")
+        state["vision"] = vision_result
 
-        state["vision"] = vision_result.content
+        # Start Fetching The Listed Assets While The Next Nodes Run
+        asset_prefetcher.start(vision_result)
         return state
     
     try:
@@ -143,13 +158,8 @@ async def vision_llm_func(state: MyState) -> MyState:
         print(f"Error in main execution: {e}")
 
 
-    image_b64= convert_to_base64(pil_image)
-
     # Create Vision Agent Chain
-    vision_llm_chat = ChatOllama(
-        model="llama4:maverick",
-        temperature=0.9,
-    )
+    vision_llm_chat = ollama_chat(model="llama4:maverick", temperature=0.9)
 
     prompt_func_runnable = RunnableLambda(prompt_func)
     chain = prompt_func_runnable | vision_llm_chat
@@ -157,42 +167,47 @@ async def vision_llm_func(state: MyState) -> MyState:
     prompt_vision = """You are an expert in image analysis, 3D modeling, and Blender scripting. 
         Provide a detailed and extensive description of the image and list all assets including hdri, models and textures you will need to create it."""
 
+    # Reuse The Description Of A Near-Duplicate Reference Image
+    vision_scope = scope(vision_llm_chat, prompt_vision)
+    image_hash = dhash(pil_image)
+    vision_result = vision_cache.lookup(image_hash, vision_scope)
+
     # Get Agent Chain Result
-    vision_result = chain.invoke({
-        "text": prompt_vision,
-        "image": image_b64,
-    })
+    if vision_result is None:
+        image_b64, image_mime = prepare_image(pil_image, vision_llm_chat)
+        vision_result = await stream_llm(chain, {
+            "text": prompt_vision,
+            "image": image_b64,
+            "mime": image_mime,
+        }, "ImageLLM", cache_node="vision_llm")
+        vision_cache.store(image_hash, vision_scope, vision_result)
 
-    print("\n")
-    print("ImageLLM Output:")
-    print("\n")
-    print(vision_result.content)
-    print("\n")
+    state["vision"] = vision_result
 
-    state["vision"] = vision_result.content
+    # Start Fetching The Listed Assets While The Next Nodes Run
+    asset_prefetcher.start(vision_result)
 
     return state
 
 async def vision_llm_func_feedback(state: MyState) -> MyState:
 
-    # Get Image Data
-    file_path = state["filepath"]
-    
-    try:
-
-        pil_image = Image.open(file_path)
-
-    except Exception as e:
-        print(f"Error in main execution: {e}")
-
+    # Get The Render Handed Back By The Tool Node
+    render_b64 = state.get("render", "")
+    if render_b64 == "":
+        print("Error in main execution: no render from the previous iteration")
+        return state
 
-    image_b64= convert_to_base64(pil_image)
+    # Skip The LLM Calls When The Render Barely Changed Or Already Matches The Reference
+    skip_reason = similarity_gate.check(render_b64, state.get("previous_render", ""), state["filepath"])
+    state["previous_render"] = render_b64
+    state["skip_reason"] = skip_reason or ""
+    if skip_reason:
+        print(f"Skipping feedback iteration: {skip_reason}")
+        return state
 
     # Create Vision Agent Chain
-    vision_llm_chat = ChatOllama(
-        model="llama4:maverick",
-        temperature=0.9,
-    )
+    vision_llm_chat = ollama_chat(model="llama4:maverick", temperature=0.9)
+    image_b64, image_mime = prepare_image(render_b64, vision_llm_chat, render=True)
 
     prompt_func_runnable = RunnableLambda(prompt_func)
     chain = prompt_func_runnable | vision_llm_chat
@@ -200,30 +215,22 @@ async def vision_llm_func_feedback(state: MyState) -> MyState:
     prompt_vision_loop = """You are an expert in image analysis, 3D modeling, and Blender scripting. 
             Provide a detailed comparison of the image and the discription.
             Mark out all the differences.
-            """+state["vision"]
+            """+state["vision"]+SCORE_INSTRUCTION
     # Get Agent Chain Result
-    vision_result = chain.invoke({
+    vision_result = await stream_llm(chain, {
         "text": prompt_vision_loop,
         "image": image_b64,
-    })
-
-    print("\n")
-    print("ImageLLM Output:")
-    print("\n")
-    print(vision_result.content)
-    print("\n")
+        "mime": image_mime,
+    }, "ImageLLM")
 
-    state["vision"] = vision_result.content
+    state["vision"] = vision_result
 
     return state
 
 async def plan_llm_func(state):
 
     # Create Plan Agent
-    plan_llm_chat = ChatOllama(
-        model="llama4:maverick",
-        temperature=0.0,
-    )
+    plan_llm_chat = ollama_chat(model="llama4:maverick", temperature=0.0)
 
 
     # Create Plan
@@ -251,47 +258,21 @@ async def plan_llm_func(state):
         This process will guide the Arrangement of assets in the 3D Scene, ensuring they are positioned scaled and oriented correctly according to the description.
         """+state["vision"]
 
-    plan = plan_llm_chat.invoke(prompt)
-    filtered_plan = re.sub(r'<think>.*?</think>\s*', '', plan.content, flags=re.DOTALL)
-
-    # Output PlanLLM
-    print("\n")
-    print("PlanLLM Output:")
-    print("\n")
-    print(filtered_plan)
-    print("\n")
+    filtered_plan = await stream_llm(plan_llm_chat, prompt, "PlanLLM", cache_node="plan_llm")
 
     state["plan"] = filtered_plan
     return state
 
 
+@uses_blender
 async def tools_llm_func(state):
 
-    # Get MCP-Tools From Server
-    client = MultiServerMCPClient(
-        {
-            "blender_mcp": {
-                "command": "uvx",
-                "args": ["blender-mcp"],
-                "transport": "stdio",
-            }
-        }
-    )
-    try:
-
-        tools = await client.get_tools()
-
-    except Exception as e:
-        print(f"Error in main execution: {e}")
-
-    # Filter The Tools
-    filtered_tools = [t for t in tools if t.name not in {"get_hyper3d_status", "get_sketchfab_status", "search_sketchfab_models","download_sketchfab_models","generate_hyper3d_model_via_text","generate_hyper3d_model_via_images","poll_rodin_job_status","import_generated_asset"}]
+    # Get MCP-Tools From The Leased Blender Worker
+    session = leased_session()
+    filtered_tools = await session.get_tools()
     
     # Create Llm Chat
-    tools_llm_chat = ChatOllama(
-        model="qwen3:235b",
-        temperature=0.0,
-    )
+    tools_llm_chat = ollama_chat(model="qwen3:235b", temperature=0.0)
     
     #Create Tool Agent
     agent = create_react_agent(
@@ -300,7 +281,8 @@ async def tools_llm_func(state):
     )
 
 
-    # Get Agent Result
+    # Get Agent Result, An Agent Or MCP Failure Leaves It Empty Instead Of Unbound
+    tool_result = {"messages": []}
     try:
         tool_result = await agent.ainvoke(
             {"messages": [{"role": "user", "content": "You are an expert in image analysis, 3D modeling, and Blender scripting."+
@@ -316,40 +298,8 @@ async def tools_llm_func(state):
     full_output = "\n\n".join(m.content for m in ai_messages)
     filtered_output = re.sub(r'<think>.*?</think>\s*', '', full_output, flags=re.DOTALL)
 
-    # Make Viewport Screenshot
-    screenshot_code = """
-        import bpy
-
-        # Create a new camera object
-        cam_data = bpy.data.cameras.new(name="MyCamera")
-        cam_object = bpy.data.objects.new("MyCamera", cam_data)
-
-        # Set camera location and rotation
-        cam_object.location = (0, -10, 7)
-        cam_object.rotation_euler = (1.1, 0, 0)
-
-        # Link the camera to the current scene
-        bpy.context.collection.objects.link(cam_object)
-
-        # Set the new camera as the active camera
-        bpy.context.scene.camera = cam_object
-
-        bpy.context.scene.render.filepath = "C:\\Users\\cross\\Desktop\\Render.png"
-        bpy.ops.render.render(write_still=True)
-
-        """
-    try:
-        tool_result = await agent.ainvoke(
-            {"messages": [{"role": "user", "content": "Execute the following Blender Python Code:\n"+screenshot_code+
-            "\nIf it does not work try to fix and reexecute it."}]}
-        )
-        print("\n")
-        print("ToolLLM Output:")
-        print("\n")
-        print("Screenshot taken.")
-        print("\n")
-    except Exception as e:
-        print(f"Error in main execution: {e}")
+    # Make Viewport Screenshot With A Direct Tool Call
+    state["render"] = await take_screenshot(session, agent, preview=state.get("preview", False))
 
     # Get Code Agent Result
     print("\n")
@@ -361,33 +311,15 @@ async def tools_llm_func(state):
 
     return state
 
+@uses_blender
 async def tools_llm_func_feedback(state):
 
-    # Get MCP-Tools From Server
-    client = MultiServerMCPClient(
-        {
-            "blender_mcp": {
-                "command": "uvx",
-                "args": ["blender-mcp"],
-                "transport": "stdio",
-            }
-        }
-    )
-    try:
-
-        tools = await client.get_tools()
-
-    except Exception as e:
-        print(f"Error in main execution: {e}")
-
-    # Filter The Tools
-    filtered_tools = [t for t in tools if t.name not in {"get_hyper3d_status", "get_sketchfab_status", "search_sketchfab_models","download_sketchfab_models","generate_hyper3d_model_via_text","generate_hyper3d_model_via_images","poll_rodin_job_status","import_generated_asset"}]
+    # Get MCP-Tools From The Leased Blender Worker
+    session = leased_session()
+    filtered_tools = await session.get_tools()
     
     # Create Llm Chat
-    tools_llm_chat = ChatOllama(
-        model="qwen3:235b",
-        temperature=0.0,
-    )
+    tools_llm_chat = ollama_chat(model="qwen3:235b", temperature=0.0)
     
     #Create Tool Agent
     agent = create_react_agent(
@@ -396,7 +328,14 @@ async def tools_llm_func_feedback(state):
     )
 
 
-    # Get Agent Result
+    # Nothing New To Execute, Only The Final Full-Quality Render Is Still Needed
+    if state.get("skip_reason"):
+        if not state.get("preview", False):
+            state["render"] = await take_screenshot(session, agent, preview=False)
+        return state
+
+    # Get Agent Result, An Agent Or MCP Failure Leaves It Empty Instead Of Unbound
+    tool_result = {"messages": []}
     try:
         tool_result = await agent.ainvoke(
             {"messages": [{"role": "user", "content": "You are an expert in image analysis, 3D modeling, and Blender scripting."+
@@ -412,40 +351,8 @@ async def tools_llm_func_feedback(state):
     full_output = "\n\n".join(m.content for m in ai_messages)
     filtered_output = re.sub(r'<think>.*?</think>\s*', '', full_output, flags=re.DOTALL)
 
-    # Make Viewport Screenshot
-    screenshot_code = """
-        import bpy
-
-        # Create a new camera object
-        cam_data = bpy.data.cameras.new(name="MyCamera")
-        cam_object = bpy.data.objects.new("MyCamera", cam_data)
-
-        # Set camera location and rotation
-        cam_object.location = (0, -10, 7)
-        cam_object.rotation_euler = (1.1, 0, 0)
-
-        # Link the camera to the current scene
-        bpy.context.collection.objects.link(cam_object)
-
-        # Set the new camera as the active camera
-        bpy.context.scene.camera = cam_object
-
-        bpy.context.scene.render.filepath = "C:\\Users\\cross\\Desktop\\Render.png"
-        bpy.ops.render.render(write_still=True)
-
-        """
-    try:
-        tool_result = await agent.ainvoke(
-            {"messages": [{"role": "user", "content": "Execute the following Blender Python Code:\n"+screenshot_code+
-            "\nIf it does not work try to fix and reexecute it."}]}
-        )
-        print("\n")
-        print("ToolLLM Output:")
-        print("\n")
-        print("Screenshot taken.")
-        print("\n")
-    except Exception as e:
-        print(f"Error in main execution: {e}")
+    # Make Viewport Screenshot With A Direct Tool Call
+    state["render"] = await take_screenshot(session, agent, preview=state.get("preview", False))
 
     # Get Code Agent Result
     print("\n")
@@ -458,68 +365,120 @@ async def tools_llm_func_feedback(state):
     return state
 
 
+async def vision_llm_node(state: MyState) -> MyState:
+
+    # The First Pass Describes The Input, Later Passes Compare The Render With It
+    if state.get("iterations"):
+        return await vision_llm_func_feedback(state)
+    return await vision_llm_func(state)
+
+
+async def tools_llm_node(state):
+
+    # Later Passes Let The Tool Agent Fix The Differences Directly
+    if state.get("iterations"):
+        return await tools_llm_func_feedback(state)
+    return await tools_llm_func(state)
+
+
+async def loop_node(state):
+    return await loop_step(state, state["filepath"])
+
+
+async def finish_node(state):
+    return await finish_step(state, state["filepath"])
+
+
+def after_vision(state):
+
+    # Only The First Pass Plans The Scene
+    return "tools_llm" if state.get("iterations") else "plan_llm"
+
+
+def build_graph():
+
+    # One Cyclic Graph: The First Pass, Then Feedback Iterations Until The Loop Controller Stops
+    graph = StateGraph(MyState)
+    graph.add_node("vision_llm", traced("vision_llm", metered("vision_llm", compacted("vision_llm", vision_llm_node, default=True))))
+    graph.add_node("plan_llm", traced("plan_llm", metered("plan_llm", compacted("plan_llm", plan_llm_func, default=True))))
+    graph.add_node("tools_llm", traced("tools_llm", metered("tools_llm", compacted("tools_llm", tools_llm_node, default=True))))
+    graph.add_node("loop", traced("loop", loop_node))
+    graph.add_node("finish", traced("finish", finish_node))
+    graph.add_edge(START, "vision_llm")
+    graph.add_conditional_edges("vision_llm", after_vision, ["plan_llm", "tools_llm"])
+    graph.add_edge("plan_llm", "tools_llm")
+    graph.add_edge("tools_llm", "loop")
+    graph.add_conditional_edges("loop", route, {"again": "vision_llm", "finish": "finish"})
+    graph.add_edge("finish", END)
+    return graph
+
+
+async def run_pipeline(user_input, file_path, preview=True, run_id=None):
+
+    # Every Finished Node Is Saved, --resume Continues A Crashed Run From There
+    run_id = run_id or new_run_id()
+    print(f"Run id: {run_id}")
+
+    # Compiled Once Per Process And Shared By Every Run And Job
+    graph = await run_store.graph(__name__, build_graph)
+
+    input_state = MyState(userinput=user_input,filepath=file_path,preview=preview,run_id=run_id)
+    return await run_store.run(graph, input_state, run_id)
+
+
 async def main():
 
-    # Open Input Window
-    app = InputApp()
-    app.mainloop()
+    parser = argparse.ArgumentParser(description="Recreate a scene in Blender from a prompt or an image.")
+    parser.add_argument("--resume", metavar="RUN_ID", help="Continue a crashed or interrupted run from its last finished node")
+    args = parser.parse_args()
+
+    if args.resume:
 
-    # Output Collected Inputs In Terminal
-    print("Inputs collected:")
-    print("llm_prompt =", app.user_input)
-    print("selected_file_path =", app.selected_file_path)
-    file_path = app.selected_file_path
-    user_input = app.user_input
+        # Take The Inputs From The Saved Run Instead Of Asking Again
+        inputs = await run_store.inputs(args.resume)
+        user_input = inputs.get("userinput", "")
+        file_path = inputs.get("filepath", "")
+        print("Resuming run", args.resume)
 
-    # Loop Until At Least One Input Collected
-    while file_path == "" and user_input == "":
+    else:
+        # Open Input Window
         app = InputApp()
         app.mainloop()
+
+        # Output Collected Inputs In Terminal
         print("Inputs collected:")
         print("llm_prompt =", app.user_input)
         print("selected_file_path =", app.selected_file_path)
         file_path = app.selected_file_path
         user_input = app.user_input
 
+        # Loop Until At Least One Input Collected
+        while file_path == "" and user_input == "":
+            app = InputApp()
+            app.mainloop()
+            print("Inputs collected:")
+            print("llm_prompt =", app.user_input)
+            print("selected_file_path =", app.selected_file_path)
+            file_path = app.selected_file_path
+            user_input = app.user_input
 
-    # Create StateGraph With Nodes And Edges
-    graph = StateGraph(MyState)
-    graph.add_node("vision_llm", vision_llm_func)
-    graph.add_node("plan_llm",plan_llm_func)
-    graph.add_node("tools_llm", tools_llm_func)
-    graph.add_edge(START,"vision_llm")
-    graph.add_edge("vision_llm", "plan_llm")
-    graph.add_edge("plan_llm","tools_llm")
-    graph.add_edge("tools_llm",END)
-    graph = graph.compile()
-
-    # Get StateGraph Output State
-    input_state = MyState(userinput=user_input,filepath=file_path)
-    output_state = await graph.ainvoke(input_state)
-
-    # Create StateGraph With Nodes And Edges for Feedback Loop
-    graph = StateGraph(MyState)
-    graph.add_node("vision_llm", vision_llm_func_feedback)
-    graph.add_node("tools_llm", tools_llm_func_feedback)
-    graph.add_edge(START,"vision_llm")
-    graph.add_edge("vision_llm", "tools_llm")
-    graph.add_edge("tools_llm",END)
-    graph = graph.compile()
-
-    # Prepare Rendering Loop
-    file_path_loop = "C:\\Users\\cross\\Desktop\\Render.png"
-    output_state["filepath"] = file_path_loop
-    input_state = output_state
-    
-    # Start Feedback Loop
-    for i in range(4):
-        print("\n")
-        print(f"++++++++++++++++++++++++++++++")
-        print(f"+ Feedback Loop iteration: {str(i+2)} +")
-        print(f"++++++++++++++++++++++++++++++")
-        print("\n")
-        output_state = await graph.ainvoke(input_state)
-        input_state = output_state
+
+    # Start Blender Workers Once For All Iterations
+    await blender_pool.start()
+
+    try:
+        # Keep The Whole Run On One Worker, Other Workers Stay Free For Code Candidates
+        async with blender_pool.lease():
+            await run_pipeline(user_input, file_path, run_id=args.resume)
+
+    finally:
+        await asset_prefetcher.close()
+        await tracer.close()
+        await blender_pool.close()
+        response_cache.print_stats()
+        print_image_stats()
+        asset_cache.print_stats()
+        await run_store.close()
 
 
 if __name__ == "__main__":
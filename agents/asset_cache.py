@@ -0,0 +1,533 @@
+from langchain_core.tools import StructuredTool
+
+import asyncio
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import textwrap
+import time
+import urllib.parse
+import urllib.request
+import uuid
+
+
+# ASSET_CACHE_MODE: "off" Leaves Polyhaven To The Addon, "mirror" Serves Imports From The Cache
+# And Downloads Misses Once, "offline" Serves Them From The Cache Or The Local Stand-In Only
+MODE = os.environ.get("ASSET_CACHE_MODE", "off")
+CACHE_DIR = os.environ.get("ASSET_CACHE_DIR", ".asset_cache")
+MAX_BYTES = int(os.environ.get("ASSET_CACHE_MAX_BYTES", 5 * 1024 * 1024 * 1024))
+
+# Local Stand-In For Polyhaven, Laid Out Like "wget -x": <dir>/api.polyhaven.com/files/<id>, <dir>/dl.polyhaven.org/...
+MIRROR_DIR = os.environ.get("POLYHAVEN_MIRROR_DIR", "")
+
+API_URL = "https://api.polyhaven.com"
+USER_AGENT = "Bachelorthesis-AssetCache"
+TIMEOUT = 60
+CHUNK_SIZE = 1024 * 1024
+
+# Same Defaults As The Blender-MCP Addon
+DEFAULT_FORMATS = {"hdris": "hdr", "textures": "jpg", "models": "gltf"}
+
+# Entries Of A Texture's File List That Are Not Texture Maps
+MODEL_FORMATS = {"blend", "gltf", "fbx", "usd", "mtlx"}
+
+TYPE_IDS = {"hdris": 0, "textures": 1, "models": 2}
+
+HDRI_CODE = textwrap.dedent("""
+    import bpy
+
+    scene = bpy.context.scene
+    world = scene.world or bpy.data.worlds.new("World")
+    scene.world = world
+    world.use_nodes = True
+    nodes = world.node_tree.nodes
+    links = world.node_tree.links
+    nodes.clear()
+
+    environment = nodes.new("ShaderNodeTexEnvironment")
+    environment.image = bpy.data.images.load({path!r}, check_existing=True)
+    background = nodes.new("ShaderNodeBackground")
+    output = nodes.new("ShaderNodeOutputWorld")
+    links.new(environment.outputs["Color"], background.inputs["Color"])
+    links.new(background.outputs["Background"], output.inputs["Surface"])
+
+    print("Successfully imported HDRI " + {asset_id!r} + " from the local asset cache")
+    """)
+
+TEXTURE_CODE = textwrap.dedent("""
+    import bpy
+
+    maps = {maps!r}
+    material = bpy.data.materials.get({asset_id!r}) or bpy.data.materials.new({asset_id!r})
+    material.use_nodes = True
+    nodes = material.node_tree.nodes
+    links = material.node_tree.links
+    nodes.clear()
+
+    output = nodes.new("ShaderNodeOutputMaterial")
+    principled = nodes.new("ShaderNodeBsdfPrincipled")
+    links.new(principled.outputs["BSDF"], output.inputs["Surface"])
+    coords = nodes.new("ShaderNodeTexCoord")
+    mapping = nodes.new("ShaderNodeMapping")
+    links.new(coords.outputs["UV"], mapping.inputs["Vector"])
+
+    def image_node(path, color):
+        node = nodes.new("ShaderNodeTexImage")
+        node.image = bpy.data.images.load(path, check_existing=True)
+        if not color:
+            node.image.colorspace_settings.name = "Non-Color"
+        links.new(mapping.outputs["Vector"], node.inputs["Vector"])
+        return node
+
+    for role, path in maps.items():
+        key = role.lower()
+        if key in ("diffuse", "diff", "albedo", "color"):
+            links.new(image_node(path, True).outputs["Color"], principled.inputs["Base Color"])
+        elif key in ("rough", "roughness"):
+            links.new(image_node(path, False).outputs["Color"], principled.inputs["Roughness"])
+        elif key in ("metal", "metallic"):
+            links.new(image_node(path, False).outputs["Color"], principled.inputs["Metallic"])
+        elif key in ("nor_gl", "normal"):
+            normal = nodes.new("ShaderNodeNormalMap")
+            links.new(image_node(path, False).outputs["Color"], normal.inputs["Color"])
+            links.new(normal.outputs["Normal"], principled.inputs["Normal"])
+        elif key in ("disp", "displacement"):
+            displacement = nodes.new("ShaderNodeDisplacement")
+            displacement.inputs["Scale"].default_value = 0.1
+            links.new(image_node(path, False).outputs["Color"], displacement.inputs["Height"])
+            links.new(displacement.outputs["Displacement"], output.inputs["Displacement"])
+
+    print("Successfully imported texture " + {asset_id!r} + " as material '" + material.name + "' from the local asset cache")
+    """)
+
+MODEL_CODE = textwrap.dedent("""
+    import bpy
+
+    path = {path!r}
+    file_format = {file_format!r}
+    before = set(bpy.data.objects.keys())
+
+    if file_format == "blend":
+        with bpy.data.libraries.load(path, link=False) as (data_from, data_to):
+            data_to.objects = list(data_from.objects)
+        for obj in data_to.objects:
+            if obj is not None:
+                bpy.context.scene.collection.objects.link(obj)
+    elif file_format == "gltf":
+        bpy.ops.import_scene.gltf(filepath=path)
+    elif file_format == "fbx":
+        bpy.ops.import_scene.fbx(filepath=path)
+    else:
+        raise ValueError("Unsupported model format: " + file_format)
+
+    created = sorted(set(bpy.data.objects.keys()) - before)
+    print("Successfully imported model " + {asset_id!r} + " from the local asset cache: " + ", ".join(created))
+    """)
+
+
+def mirror_path(mirror_dir, url):
+
+    # https://dl.polyhaven.org/file/x.hdr -> <mirror_dir>/dl.polyhaven.org/file/x.hdr
+    parts = urllib.parse.urlsplit(url)
+    return os.path.join(mirror_dir, parts.netloc, *parts.path.strip("/").split("/"))
+
+
+def select_files(listing, asset_id, asset_type, resolution, file_format):
+
+    # (Name, Role, File Info) For Every File The Import Needs, Read From Polyhaven's /files Listing
+    files = []
+    if asset_type == "hdris":
+        info = listing.get("hdri", {}).get(resolution, {}).get(file_format)
+        if info:
+            files.append((os.path.basename(urllib.parse.urlsplit(info["url"]).path), "hdri", info))
+
+    elif asset_type == "textures":
+        for role, resolutions in listing.items():
+            if role in MODEL_FORMATS or not isinstance(resolutions, dict):
+                continue
+            info = resolutions.get(resolution, {}).get(file_format)
+            if info:
+                files.append((os.path.basename(urllib.parse.urlsplit(info["url"]).path), role, info))
+
+    elif asset_type == "models":
+        info = listing.get(file_format, {}).get(resolution, {}).get(file_format)
+        if info:
+            files.append((os.path.basename(urllib.parse.urlsplit(info["url"]).path), file_format, info))
+            for name, included in info.get("include", {}).items():
+                files.append((name, "include", included))
+
+    if not files:
+        raise KeyError(f"Polyhaven has no {resolution} {file_format} files for {asset_type} {asset_id}")
+
+    return files
+
+
+class AssetCache:
+
+    # Content-Addressed Polyhaven Files With A SQLite Index And LRU Eviction By Disk Quota
+    def __init__(self, directory=CACHE_DIR, max_bytes=MAX_BYTES, mode=MODE, mirror_dir=MIRROR_DIR):
+        self.directory = os.path.abspath(directory)
+        self.max_bytes = max_bytes
+        self.mode = mode
+        self.mirror_dir = mirror_dir
+
+        self.connection = None
+        self.assets = None
+        self.pending = {}
+        self.stats = {"hits": 0, "misses": 0, "bytes_downloaded": 0, "evicted": 0}
+
+    def db(self):
+
+        # Opened On First Use, Nothing Is Created While The Cache Is Off
+        if self.connection is None:
+            os.makedirs(self.directory, exist_ok=True)
+            self.connection = sqlite3.connect(os.path.join(self.directory, "index.sqlite"))
+            self.connection.executescript("""
+                CREATE TABLE IF NOT EXISTS assets (
+                    asset_id TEXT, asset_type TEXT, resolution TEXT, file_format TEXT,
+                    files TEXT, size INTEGER, last_used REAL,
+                    PRIMARY KEY (asset_id, asset_type, resolution, file_format)
+                );
+                CREATE TABLE IF NOT EXISTS blobs (sha256 TEXT PRIMARY KEY, size INTEGER);
+                """)
+        return self.connection
+
+    def blob_path(self, sha256):
+        return os.path.join(self.directory, "objects", sha256[:2], sha256)
+
+    def view_path(self, asset_id, asset_type, resolution, file_format):
+        return os.path.join(self.directory, "views", asset_id, f"{asset_type}_{resolution}_{file_format}")
+
+    def open_source(self, url):
+
+        # Prefer The Local Stand-In, Only Mirror Mode May Go To The Network
+        if self.mirror_dir:
+            path = mirror_path(self.mirror_dir, url)
+            if os.path.isfile(path):
+                return open(path, "rb")
+
+        if self.mode == "offline":
+            raise FileNotFoundError(f"{url} is not in the local mirror {self.mirror_dir or '(POLYHAVEN_MIRROR_DIR is not set)'}")
+
+        request = urllib.request.Request(url, headers={"User-Agent": USER_AGENT})
+        return urllib.request.urlopen(request, timeout=TIMEOUT)
+
+    def read_json(self, url):
+        with self.open_source(url) as source:
+            return json.loads(source.read().decode("utf-8"))
+
+    def store(self, url, md5=None):
+
+        # Stream One File Into The Store, Runs In A Worker Thread
+        tmp_dir = os.path.join(self.directory, "tmp")
+        os.makedirs(tmp_dir, exist_ok=True)
+        tmp_path = os.path.join(tmp_dir, uuid.uuid4().hex)
+
+        sha256 = hashlib.sha256()
+        checksum = hashlib.md5()
+        size = 0
+        try:
+            with self.open_source(url) as source, open(tmp_path, "wb") as f:
+                while True:
+                    chunk = source.read(CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    sha256.update(chunk)
+                    checksum.update(chunk)
+                    f.write(chunk)
+                    size += len(chunk)
+
+            if md5 and checksum.hexdigest() != md5:
+                raise ValueError(f"Checksum mismatch for {url}")
+
+            path = self.blob_path(sha256.hexdigest())
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.replace(tmp_path, path)
+
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+        return sha256.hexdigest(), size
+
+    def lookup(self, asset_id, asset_type, resolution, file_format):
+
+        row = self.db().execute(
+            "SELECT files FROM assets WHERE asset_id = ? AND asset_type = ? AND resolution = ? AND file_format = ?",
+            (asset_id, asset_type, resolution, file_format),
+        ).fetchone()
+        if row is None:
+            return None
+
+        files = json.loads(row[0])
+        if not all(os.path.exists(self.blob_path(record["sha256"])) for record in files):
+            return None
+
+        # Touch The Entry So Eviction Keeps Recently Used Assets
+        with self.db():
+            self.db().execute(
+                "UPDATE assets SET last_used = ? WHERE asset_id = ? AND asset_type = ? AND resolution = ? AND file_format = ?",
+                (time.time(), asset_id, asset_type, resolution, file_format),
+            )
+
+        return self.materialize(asset_id, asset_type, resolution, file_format, files)
+
+    def materialize(self, asset_id, asset_type, resolution, file_format, files):
+
+        # Lay The Files Out Under Their Polyhaven Names, Models Find Their Textures By Relative Path
+        directory = self.view_path(asset_id, asset_type, resolution, file_format)
+        paths = {}
+        for record in files:
+            target = os.path.normpath(os.path.join(directory, record["name"]))
+            if not target.startswith(directory + os.sep):
+                raise ValueError(f"Unsafe file name {record['name']} in {asset_id}")
+
+            if not os.path.exists(target):
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                try:
+                    os.link(self.blob_path(record["sha256"]), target)
+                except OSError:
+                    shutil.copyfile(self.blob_path(record["sha256"]), target)
+
+            paths[record["name"]] = target
+
+        return {
+            "asset_id": asset_id,
+            "asset_type": asset_type,
+            "resolution": resolution,
+            "file_format": file_format,
+            "directory": directory,
+            "files": [dict(record, path=paths[record["name"]]) for record in files],
+        }
+
+    async def ensure(self, asset_id, asset_type, resolution="1k", file_format=None):
+
+        # Local Copy Of One Asset, Downloaded Only On The First Request
+        file_format = file_format or DEFAULT_FORMATS.get(asset_type, "")
+        key = (asset_id, asset_type, resolution, file_format)
+
+        entry = self.lookup(*key)
+        if entry is not None:
+            self.stats["hits"] += 1
+            print(f"Asset cache hit: {asset_type} {asset_id} ({resolution} {file_format})")
+            return entry
+
+        # Concurrent Requests For The Same Asset Share One Download
+        if key not in self.pending:
+            task = asyncio.ensure_future(self.download(*key))
+            self.pending[key] = task
+
+            # The Task Removes Itself, Also When Every Waiting Request Was Cancelled Before It Finished
+            task.add_done_callback(lambda done, key=key: self.finished(key, done))
+
+        return await asyncio.shield(self.pending[key])
+
+    def finished(self, key, task):
+
+        if self.pending.get(key) is task:
+            del self.pending[key]
+
+        # Mark A Failure Nobody Awaits Anymore As Seen, The Next Request Downloads Again
+        if not task.cancelled():
+            task.exception()
+
+    async def download(self, asset_id, asset_type, resolution, file_format):
+
+        started = time.perf_counter()
+        self.stats["misses"] += 1
+
+        listing = await asyncio.to_thread(self.read_json, f"{API_URL}/files/{asset_id}")
+        selected = select_files(listing, asset_id, asset_type, resolution, file_format)
+        stored = await asyncio.gather(*(asyncio.to_thread(self.store, info["url"], info.get("md5")) for _, _, info in selected))
+
+        files = [
+            {"name": name, "role": role, "sha256": sha256, "size": size, "blob": os.path.relpath(self.blob_path(sha256), self.directory)}
+            for (name, role, _), (sha256, size) in zip(selected, stored)
+        ]
+        size = sum(record["size"] for record in files)
+        self.stats["bytes_downloaded"] += size
+
+        with self.db():
+            self.db().executemany(
+                "INSERT OR IGNORE INTO blobs (sha256, size) VALUES (?, ?)",
+                [(record["sha256"], record["size"]) for record in files],
+            )
+            self.db().execute(
+                "INSERT OR REPLACE INTO assets VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (asset_id, asset_type, resolution, file_format, json.dumps(files), size, time.time()),
+            )
+
+        print(f"Asset cache miss: {asset_type} {asset_id} ({resolution} {file_format}), "
+              f"{len(files)} files, {size / 1024 / 1024:.1f} MB in {time.perf_counter() - started:.1f}s")
+
+        self.evict(keep=(asset_id, asset_type, resolution, file_format))
+        return self.materialize(asset_id, asset_type, resolution, file_format, files)
+
+    def evict(self, keep=None):
+
+        # Drop Least Recently Used Assets Until The Store Fits The Quota
+        db = self.db()
+        total = db.execute("SELECT COALESCE(SUM(size), 0) FROM blobs").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        rows = db.execute("SELECT asset_id, asset_type, resolution, file_format FROM assets ORDER BY last_used").fetchall()
+        with db:
+            for row in rows:
+                if total <= self.max_bytes:
+                    break
+                if tuple(row) == keep:
+                    continue
+
+                db.execute("DELETE FROM assets WHERE asset_id = ? AND asset_type = ? AND resolution = ? AND file_format = ?", row)
+                shutil.rmtree(self.view_path(*row), ignore_errors=True)
+                self.stats["evicted"] += 1
+
+                # Blobs Are Shared Between Assets, Only Unreferenced Ones Free Space
+                referenced = set()
+                for (files,) in db.execute("SELECT files FROM assets"):
+                    referenced.update(record["sha256"] for record in json.loads(files))
+                for sha256, size in db.execute("SELECT sha256, size FROM blobs").fetchall():
+                    if sha256 not in referenced:
+                        db.execute("DELETE FROM blobs WHERE sha256 = ?", (sha256,))
+                        if os.path.exists(self.blob_path(sha256)):
+                            os.remove(self.blob_path(sha256))
+                        total -= size
+
+    async def listing(self):
+
+        # Polyhaven's /assets Listing, Read Once Per Process, Plus Everything Already Cached
+        if self.assets is None:
+            try:
+                self.assets = await asyncio.to_thread(self.read_json, f"{API_URL}/assets")
+            except Exception as e:
+                print(f"Error in main execution: {e}")
+                return self.cached_listing({})
+
+        return self.cached_listing(dict(self.assets))
+
+    def cached_listing(self, assets):
+        for asset_id, asset_type in self.db().execute("SELECT DISTINCT asset_id, asset_type FROM assets"):
+            assets.setdefault(asset_id, {"name": asset_id, "type": TYPE_IDS.get(asset_type), "categories": []})
+
+        return assets
+
+    async def search(self, asset_type="all", categories=None):
+
+        wanted = {category.strip() for category in (categories or "").split(",") if category.strip()}
+        matches = [
+            (asset_id, info) for asset_id, info in (await self.listing()).items()
+            if (asset_type in ("all", None) or info.get("type") == TYPE_IDS.get(asset_type))
+            and (not wanted or wanted & set(info.get("categories", [])))
+        ]
+        matches.sort(key=lambda match: -match[1].get("download_count", 0))
+
+        lines = [f"Found {len(matches)} assets" + (f" in categories: {categories}" if wanted else "") + " (offline):"]
+        for asset_id, info in matches[:20]:
+            lines.append(f"- {info.get('name', asset_id)} (ID: {asset_id})")
+            lines.append(f"  Categories: {', '.join(info.get('categories', []))}")
+
+        return "\n".join(lines)
+
+    async def categories(self, asset_type="hdris"):
+
+        counts = {}
+        for info in (await self.listing()).values():
+            if asset_type in ("all", None) or info.get("type") == TYPE_IDS.get(asset_type):
+                for category in info.get("categories", []):
+                    counts[category] = counts.get(category, 0) + 1
+
+        lines = [f"Categories for {asset_type} (offline):"]
+        for category, count in sorted(counts.items(), key=lambda item: -item[1]):
+            lines.append(f"- {category}: {count} assets")
+
+        return "\n".join(lines)
+
+    def print_stats(self):
+
+        if self.connection is None:
+            return
+
+        count, size = self.db().execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM assets").fetchone()
+        print("\n")
+        print("Asset Cache:")
+        print(f"{self.stats['hits']} hits, {self.stats['misses']} misses, "
+              f"{self.stats['bytes_downloaded'] / 1024 / 1024:.1f} MB downloaded, {self.stats['evicted']} evicted, "
+              f"{count} assets cached ({size / 1024 / 1024:.1f} MB of {self.max_bytes / 1024 / 1024:.0f} MB)")
+        print("\n")
+
+
+def import_code(entry):
+
+    paths = {record["role"]: record["path"] for record in entry["files"]}
+    if entry["asset_type"] == "hdris":
+        return HDRI_CODE.format(path=paths["hdri"], asset_id=entry["asset_id"])
+    if entry["asset_type"] == "textures":
+        return TEXTURE_CODE.format(maps=paths, asset_id=entry["asset_id"])
+
+    return MODEL_CODE.format(path=paths[entry["file_format"]], file_format=entry["file_format"], asset_id=entry["asset_id"])
+
+
+async def import_asset(session, asset_id, asset_type, resolution="1k", file_format=None):
+
+    entry = await asset_cache.ensure(asset_id, asset_type, resolution, file_format)
+    result = await session.call_tool("execute_blender_code", {"code": import_code(entry)})
+    if str(result).lstrip().startswith("Error"):
+        raise RuntimeError(str(result))
+
+    return str(result)
+
+
+def cached_download_tool(tool, session):
+
+    # Same Name And Arguments As The Addon's Tool, So The Prompts And Agents Stay Unchanged
+    async def download_polyhaven_asset(asset_id, asset_type, resolution="1k", file_format=None, **kwargs):
+        try:
+            return await import_asset(session, asset_id, asset_type, resolution, file_format)
+
+        except Exception as e:
+            print(f"Error in main execution: {e}")
+            if asset_cache.mode == "offline":
+                return f"Error: {asset_type} {asset_id} is not available offline: {e}"
+
+            arguments = {"asset_id": asset_id, "asset_type": asset_type, "resolution": resolution, **kwargs}
+            if file_format:
+                arguments["file_format"] = file_format
+            return await tool.ainvoke(arguments)
+
+    return StructuredTool(name=tool.name, description=tool.description, args_schema=tool.args_schema,
+                          coroutine=download_polyhaven_asset)
+
+
+def offline_tool(tool, handler):
+
+    async def run(**kwargs):
+        return await handler(**kwargs)
+
+    return StructuredTool(name=tool.name, description=tool.description, args_schema=tool.args_schema, coroutine=run)
+
+
+def wrap_tools(tools, session):
+
+    # Route The Polyhaven Tools Through The Cache, Everything Else Is Passed On Untouched
+    if asset_cache.mode not in ("mirror", "offline"):
+        return tools
+
+    wrapped = []
+    for tool in tools:
+        if tool.name == "download_polyhaven_asset":
+            wrapped.append(cached_download_tool(tool, session))
+        elif asset_cache.mode == "offline" and tool.name == "search_polyhaven_assets":
+            wrapped.append(offline_tool(tool, asset_cache.search))
+        elif asset_cache.mode == "offline" and tool.name == "get_polyhaven_categories":
+            wrapped.append(offline_tool(tool, asset_cache.categories))
+        else:
+            wrapped.append(tool)
+
+    return wrapped
+
+
+# Shared Cache, One Index Per Process
+asset_cache = AssetCache()
@@ -0,0 +1,189 @@
+import asyncio
+import os
+import re
+import time
+
+from asset_cache import asset_cache, TYPE_IDS
+
+
+# Assets Fetched Per Vision Result, Resolution As Requested By The Tool Agent By Default
+MAX_ASSETS = int(os.environ.get("PREFETCH_MAX_ASSETS", 8))
+CONCURRENCY = int(os.environ.get("PREFETCH_CONCURRENCY", 4))
+RESOLUTION = os.environ.get("PREFETCH_RESOLUTION", "1k")
+
+# Headings And Labels That Open A List Of One Asset Type
+SECTIONS = [
+    ("hdris", re.compile(r"\b(hdris?|hdr|environment maps?|sky ?box|world lighting)\b", re.IGNORECASE)),
+    ("textures", re.compile(r"\b(textures?|materials?)\b", re.IGNORECASE)),
+    ("models", re.compile(r"\b(models?|meshes|objects|props|furniture)\b", re.IGNORECASE)),
+]
+
+BULLET = re.compile(r"^\s*(?:[-*+•]|\d+[.)])\s+(.*)$")
+
+# Polyhaven Ids Look Like "kloofendal_48d_partly_cloudy"
+ASSET_ID = re.compile(r"\b[a-z0-9]+(?:_[a-z0-9]+)+\b")
+
+STOP_WORDS = {
+    "the", "and", "with", "for", "from", "that", "this", "some", "like", "use", "used", "using",
+    "hdri", "hdris", "hdr", "texture", "textures", "material", "materials", "model", "models",
+    "asset", "assets", "polyhaven", "scene", "blender", "e.g",
+}
+
+
+def section_of(text):
+    for asset_type, pattern in SECTIONS:
+        if pattern.search(text):
+            return asset_type
+    return None
+
+
+def words(text):
+    return {word for word in re.findall(r"[a-z]+", text.lower()) if len(word) > 2 and word not in STOP_WORDS}
+
+
+def extract_assets(text):
+
+    # (Asset Type, Description) For Every Entry Of The Asset Lists In The Vision Output
+    items = []
+    section = None
+    for line in (text or "").splitlines():
+        bullet = BULLET.match(line)
+        clean = re.sub(r"[*#`]", "", bullet.group(1) if bullet else line).strip()
+        if not clean:
+            continue
+
+        # "HDRI: sunset sky" Or "### Textures:" Switches The Section, Text After The Colon Lists Entries
+        label, colon, rest = clean.partition(":")
+        label_section = section_of(label) if colon and len(label) <= 40 else None
+        if label_section is None and not bullet and len(clean) <= 40:
+            label_section = section_of(clean)
+            rest = ""
+
+        if label_section is not None:
+            section = label_section
+            items.extend((section, entry.strip()) for entry in re.split(r"[,;]", rest) if entry.strip())
+        elif bullet and section is not None:
+            items.append((section, clean))
+        elif not bullet:
+            section = None
+
+    return items
+
+
+def script_assets(code):
+
+    # Polyhaven Ids Written Into A Script, The Type Comes From The Index
+    return [(None, asset_id) for asset_id in ASSET_ID.findall(code or "")]
+
+
+class AssetPrefetcher:
+
+    # Warm The Asset Cache In The Background While The Plan And Code Nodes Run
+    def __init__(self, max_assets=MAX_ASSETS, concurrency=CONCURRENCY, resolution=RESOLUTION):
+        self.max_assets = max_assets
+        self.concurrency = concurrency
+        self.resolution = resolution
+
+        self.index = None
+        self.tasks = set()
+        self.started = set()
+
+    async def load_index(self):
+
+        # Searchable Words Per Polyhaven Asset, Built Once Per Process
+        if self.index is None:
+            self.index = {
+                asset_id: (info.get("type"), words(" ".join([asset_id.replace("_", " "), info.get("name", "")]
+                                                          + list(info.get("tags", [])) + list(info.get("categories", [])))),
+                           info.get("download_count", 0))
+                for asset_id, info in (await asset_cache.listing()).items()
+            }
+        return self.index
+
+    def match(self, items, index):
+
+        type_names = {type_id: asset_type for asset_type, type_id in TYPE_IDS.items()}
+        matches = []
+
+        for asset_type, description in items:
+
+            # Ids Named In The Text Win Over Keyword Matches
+            named = [asset_id for asset_id in ASSET_ID.findall(description.lower()) if asset_id in index]
+            if named:
+                matches.extend((type_names.get(index[asset_id][0], asset_type), asset_id) for asset_id in named)
+                continue
+
+            if asset_type is None:
+                continue
+
+            wanted = words(description)
+            best = None
+            for asset_id, (type_id, keys, downloads) in index.items():
+                if type_id != TYPE_IDS[asset_type]:
+                    continue
+                score = (len(wanted & keys), downloads)
+                if score[0] and (best is None or score > best[0]):
+                    best = (score, asset_id)
+
+            if best is not None:
+                matches.append((asset_type, best[1]))
+
+        # Keep The Order The Vision Model Listed Them In
+        unique = []
+        for match in matches:
+            if match not in unique:
+                unique.append(match)
+        return unique[:self.max_assets]
+
+    async def prefetch(self, text, extract=extract_assets):
+
+        started = time.perf_counter()
+        try:
+            items = extract(text)
+            if not items:
+                return
+            matches = self.match(items, await self.load_index())
+        except Exception as e:
+            print(f"Error in main execution: {e}")
+            return
+
+        matches = [match for match in matches if match not in self.started]
+        if not matches:
+            return
+        self.started.update(matches)
+        print(f"Prefetching {len(matches)} assets: {', '.join(f'{asset_type} {asset_id}' for asset_type, asset_id in matches)}")
+
+        limit = asyncio.Semaphore(self.concurrency)
+
+        async def fetch(asset_type, asset_id):
+            async with limit:
+                try:
+                    await asset_cache.ensure(asset_id, asset_type, self.resolution)
+                    return True
+                except Exception as e:
+                    print(f"Error in main execution: {e}")
+                    self.started.discard((asset_type, asset_id))
+                    return False
+
+        results = await asyncio.gather(*(fetch(asset_type, asset_id) for asset_type, asset_id in matches))
+        print(f"Prefetched {sum(results)} of {len(matches)} assets in {time.perf_counter() - started:.1f}s")
+
+    def start(self, text, extract=extract_assets):
+
+        # Returns At Once, The Downloads Overlap With The Following Nodes
+        if asset_cache.mode not in ("mirror", "offline"):
+            return
+
+        task = asyncio.ensure_future(self.prefetch(text, extract))
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+    async def close(self):
+
+        # Let Running Downloads Finish, A Cancelled One Would Only Leave A Temporary File
+        if self.tasks:
+            await asyncio.gather(*self.tasks, return_exceptions=True)
+
+
+# Shared Prefetcher, The Asset Index Is Only Loaded Once
+asset_prefetcher = AssetPrefetcher()
@@ -0,0 +1,207 @@
+import argparse
+import asyncio
+import importlib
+import json
+import os
+import time
+import traceback
+
+import concurrency
+from blender_pool import BlenderPool
+from response_cache import response_cache
+from image_prep import print_image_stats
+from asset_cache import asset_cache
+from asset_prefetch import asset_prefetcher
+from run_store import run_store, new_run_id
+from usage_tracker import usage_tracker
+from tracing import tracer
+
+
+VARIANTS = {
+    "vg": "agent_vg",
+    "vg_no_plan": "agent_vg_no_plan",
+    "vo": "agent_vo",
+    "vo_no_code": "agent_vo_no_code",
+    "vo_no_plan": "agent_vo_no_plan",
+    "vol": "agent_vol",
+}
+
+# Base64 Renders Are Too Large For The Result Records
+IMAGE_FIELDS = {"render", "previous_render"}
+
+
+def read_jobs(path, default_variant):
+
+    # One Job Per Line: {"id": ..., "prompt": ..., "image": ..., "variant": ...}
+    jobs = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line_number, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line:
+                continue
+
+            job = json.loads(line)
+            jobs.append({
+                "id": str(job.get("id", line_number)),
+                "prompt": job.get("prompt") or "",
+                "image": job.get("image") or "",
+                "variant": job.get("variant") or default_variant,
+            })
+
+    return jobs
+
+
+def completed_ids(path):
+
+    # Jobs Already Written By An Earlier, Interrupted Batch
+    done = set()
+    if not os.path.exists(path):
+        return done
+
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if record.get("status") == "ok":
+                done.add(record["id"])
+
+    return done
+
+
+def load_variant(name):
+
+    module = importlib.import_module(VARIANTS.get(name, name))
+
+    # API_KEY Is Normally Set In The Variant's __main__ Block
+    if not hasattr(module, "API_KEY"):
+        module.API_KEY = os.environ.get("GOOGLE_API_KEY", "")
+
+    return module
+
+
+class ResultWriter:
+
+    # Append One Record Per Job And Flush Immediately So Partial Results Survive Crashes
+    def __init__(self, path):
+        self.file = open(path, "a", encoding="utf-8")
+        self.lock = asyncio.Lock()
+
+    async def write(self, record):
+        async with self.lock:
+            self.file.write(json.dumps(record, default=str) + "\n")
+            self.file.flush()
+            os.fsync(self.file.fileno())
+
+    def close(self):
+        self.file.close()
+
+
+async def run_job(job, module, writer, pool, batch_id):
+
+    started = time.time()
+    record = {
+        "id": job["id"],
+        "variant": job["variant"],
+        "prompt": job["prompt"],
+        "image": job["image"],
+        "run_id": f"{batch_id}-{job['id']}",
+        "started": started,
+    }
+
+    print(f"Job {job['id']} ({job['variant']}) started.")
+
+    try:
+        # Keep The Job On One Worker So Its Scene Survives Between Iterations
+        async with pool.lease() as worker:
+            record["blender_port"] = worker.port
+            output_state = await module.run_pipeline(job["prompt"], job["image"], run_id=record["run_id"])
+        record["status"] = "ok"
+        record["state"] = {k: v for k, v in dict(output_state).items() if isinstance(v, (str, int, float)) and k not in IMAGE_FIELDS}
+
+    except Exception as e:
+        record["status"] = "error"
+        record["error"] = f"{type(e).__name__}: {e}"
+        record["traceback"] = traceback.format_exc()
+        print(f"Error in main execution: {e}")
+
+    record["duration_s"] = round(time.time() - started, 3)
+    record["usage"] = usage_tracker.totals(record["run_id"])
+    await writer.write(record)
+
+    print(f"Job {job['id']} finished with status {record['status']} in {record['duration_s']}s.")
+
+
+async def run_batch(jobs_path, output_path, default_variant, max_jobs, llm_concurrency, blender_concurrency, blender_workers, skip_done, resume):
+
+    concurrency.configure(llm=llm_concurrency, blender=blender_concurrency)
+
+    # Run Ids Are Derived From The Batch Id, --resume Picks Up Every Job's Saved Progress
+    batch_id = resume or new_run_id()
+    print(f"Batch id: {batch_id}")
+
+    jobs = read_jobs(jobs_path, default_variant)
+    if skip_done:
+        done = completed_ids(output_path)
+        jobs = [job for job in jobs if job["id"] not in done]
+
+    modules = {name: load_variant(name) for name in {job["variant"] for job in jobs}}
+
+    # One Pool Of Pre-Warmed Blender Workers Serves Every Variant In The Batch
+    if blender_workers > 0:
+        pool = BlenderPool.spawn(blender_workers)
+    else:
+        pool = BlenderPool.from_env()
+    await pool.start()
+
+    writer = ResultWriter(output_path)
+    job_limit = asyncio.Semaphore(max_jobs)
+
+    async def limited(job):
+        async with job_limit:
+            await run_job(job, modules[job["variant"]], writer, pool, batch_id)
+
+    try:
+        await asyncio.gather(*(limited(job) for job in jobs))
+
+    finally:
+        writer.close()
+        await asset_prefetcher.close()
+        await tracer.close()
+        await pool.close()
+        await run_store.close()
+        response_cache.print_stats()
+        print_image_stats()
+        asset_cache.print_stats()
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description="Run a JSONL file of scene jobs through the agent pipelines.")
+    parser.add_argument("jobs", help="JSONL file with prompt, image and variant per line")
+    parser.add_argument("--output", default="results.jsonl", help="JSONL file the results are appended to")
+    parser.add_argument("--variant", default="vo", help="Variant for jobs without a variant field")
+    parser.add_argument("--max-jobs", type=int, default=4, help="Pipelines running at the same time")
+    parser.add_argument("--llm-concurrency", type=int, default=2, help="LLM calls running at the same time")
+    parser.add_argument("--blender-concurrency", type=int, default=0, help="Extra limit on Blender tool steps, 0 means one per worker")
+    parser.add_argument("--blender-workers", type=int, default=0, help="Blender instances to spawn, 0 uses BLENDER_WORKERS or the running Blender")
+    parser.add_argument("--skip-done", action="store_true", help="Skip jobs that already have an ok record in the output")
+    parser.add_argument("--resume", metavar="BATCH_ID", help="Continue the jobs of an interrupted batch from their last finished node")
+    args = parser.parse_args()
+
+    asyncio.run(run_batch(
+        args.jobs,
+        args.output,
+        args.variant,
+        args.max_jobs,
+        args.llm_concurrency,
+        args.blender_concurrency,
+        args.blender_workers,
+        args.skip_done,
+        args.resume,
+    ))
+
+
+if __name__ == "__main__":
+    main()
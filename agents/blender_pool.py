@@ -0,0 +1,291 @@
+from contextlib import asynccontextmanager
+import asyncio
+import contextvars
+import functools
+import os
+import tempfile
+
+from concurrency import blender_slot
+from mcp_session import BlenderMCPSession
+
+
+BLENDER_COMMAND = os.environ.get("BLENDER_COMMAND", "blender")
+BLENDER_MCP_ADDON = os.environ.get("BLENDER_MCP_ADDON", "addon")
+BLENDER_HOST = "localhost"
+BASE_PORT = int(os.environ.get("BLENDER_BASE_PORT", 9876))
+STARTUP_TIMEOUT = 120
+
+# Runs Inside Each Spawned Blender: Enable The Addon And Start Its Socket Server On The Given Port
+STARTUP_SCRIPT = """
+import sys
+import bpy
+
+port = int(sys.argv[sys.argv.index("--") + 1])
+
+def start_server():
+    bpy.ops.preferences.addon_enable(module={addon!r})
+    bpy.context.scene.blendermcp_port = port
+    bpy.ops.blendermcp.start_server()
+    print(f"BlenderMCP worker listening on port {{port}}")
+
+bpy.app.timers.register(start_server, first_interval=1.0)
+"""
+
+# Worker Leased By The Running Tool Node
+current_worker = contextvars.ContextVar("current_worker", default=None)
+
+# Pool Used By Tool Nodes, Set By BlenderPool.start()
+active_pool = None
+
+
+def worker_connections(port):
+
+    # One Blender-MCP Stdio Server Per Worker, Pointed At The Worker's Addon Port
+    env = dict(os.environ)
+    env["BLENDER_HOST"] = BLENDER_HOST
+    env["BLENDER_PORT"] = str(port)
+
+    return {
+        "blender_mcp": {
+            "command": "uvx",
+            "args": ["blender-mcp"],
+            "transport": "stdio",
+            "env": env,
+        }
+    }
+
+
+async def port_open(port, timeout=2.0):
+
+    try:
+        _, writer = await asyncio.wait_for(asyncio.open_connection(BLENDER_HOST, port), timeout)
+    except (OSError, asyncio.TimeoutError):
+        return False
+
+    writer.close()
+    try:
+        await writer.wait_closed()
+    except OSError:
+        pass
+    return True
+
+
+class BlenderWorker:
+
+    # One Blender Instance With Its Own Addon Port And MCP Session
+    def __init__(self, port=BASE_PORT, session=None, spawn=False, blender_command=BLENDER_COMMAND):
+        self.port = port
+        self.spawn = spawn
+        self.blender_command = blender_command
+        self.process = None
+        self.session = session or BlenderMCPSession(worker_connections(port))
+
+    def __repr__(self):
+        return f"BlenderWorker(port={self.port})"
+
+    async def start(self):
+
+        if self.spawn:
+            self.process = await asyncio.create_subprocess_exec(
+                self.blender_command, "--python", startup_script_path(), "--", str(self.port),
+                stdout=asyncio.subprocess.DEVNULL,
+                stderr=asyncio.subprocess.DEVNULL,
+            )
+
+            # Wait Until The Addon Accepts Connections
+            loop = asyncio.get_running_loop()
+            deadline = loop.time() + STARTUP_TIMEOUT
+            while not await port_open(self.port):
+                if self.process.returncode is not None:
+                    raise RuntimeError(f"Blender on port {self.port} exited with code {self.process.returncode}")
+                if loop.time() > deadline:
+                    raise RuntimeError(f"Blender on port {self.port} did not start within {STARTUP_TIMEOUT}s")
+                await asyncio.sleep(1)
+
+        await self.session.open()
+        print(f"Blender worker on port {self.port} ready.")
+
+    async def is_healthy(self):
+
+        if self.process is not None and self.process.returncode is not None:
+            return False
+
+        return await port_open(self.port) and self.session.is_alive()
+
+    async def stop(self):
+
+        await self.session.close()
+
+        if self.process is not None and self.process.returncode is None:
+            self.process.terminate()
+            try:
+                await asyncio.wait_for(self.process.wait(), 10)
+            except asyncio.TimeoutError:
+                self.process.kill()
+                await self.process.wait()
+
+        self.process = None
+
+    async def restart(self):
+        print(f"Replacing Blender worker on port {self.port}.")
+        await self.stop()
+        await self.start()
+
+
+_startup_script = None
+
+
+def startup_script_path():
+
+    global _startup_script
+    if _startup_script is None:
+        fd, _startup_script = tempfile.mkstemp(prefix="blendermcp_worker_", suffix=".py")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(STARTUP_SCRIPT.format(addon=BLENDER_MCP_ADDON))
+
+    return _startup_script
+
+
+class BlenderPool:
+
+    # Lease/Return Pool Of Blender Workers Shared By All Pipelines
+    def __init__(self, workers, health_interval=30):
+        self.workers = workers
+        self.health_interval = health_interval
+        self.idle = None
+        self.monitor = None
+
+    @classmethod
+    def external(cls, session=None):
+
+        # The Single Blender The User Started By Hand, Not Managed By The Pool
+        return cls([BlenderWorker(BASE_PORT, session=session)])
+
+    @classmethod
+    def spawn(cls, size, blender_command=BLENDER_COMMAND, base_port=BASE_PORT):
+        return cls([BlenderWorker(base_port + i, spawn=True, blender_command=blender_command) for i in range(size)])
+
+    @classmethod
+    def from_env(cls, session=None):
+
+        # BLENDER_WORKERS=N Spawns N Blender Instances, Otherwise Use The Running One
+        size = int(os.environ.get("BLENDER_WORKERS", 0))
+        if size > 0:
+            return cls.spawn(size)
+        return cls.external(session)
+
+    def __len__(self):
+        return len(self.workers)
+
+    async def start(self):
+
+        global active_pool
+
+        # Pre-Warm All Workers In Parallel
+        await asyncio.gather(*(worker.start() for worker in self.workers))
+
+        self.idle = asyncio.Queue()
+        for worker in self.workers:
+            self.idle.put_nowait(worker)
+
+        self.monitor = asyncio.create_task(self._monitor())
+        active_pool = self
+        return self
+
+    async def _monitor(self):
+
+        # Replace Crashed Spawned Workers While They Are Idle
+        while True:
+            await asyncio.sleep(self.health_interval)
+            for _ in range(self.idle.qsize()):
+                worker = self.idle.get_nowait()
+                if worker.spawn and not await worker.is_healthy():
+                    try:
+                        await worker.restart()
+                    except Exception as e:
+                        print(f"Error in main execution: {e}")
+                self.idle.put_nowait(worker)
+
+    async def check(self, worker):
+
+        # Health Check Before Handing The Worker Out
+        if not await worker.is_healthy():
+            try:
+                if worker.spawn:
+                    await worker.restart()
+                else:
+                    await worker.session.reconnect()
+            except Exception as e:
+                print(f"Error in main execution: {e}")
+
+        return worker
+
+    async def acquire(self):
+        return await self.check(await self.idle.get())
+
+    async def try_acquire(self):
+
+        # A Worker That Is Idle Right Now, Or None Instead Of Waiting For One
+        try:
+            worker = self.idle.get_nowait()
+        except asyncio.QueueEmpty:
+            return None
+
+        return await self.check(worker)
+
+    def release(self, worker):
+        self.idle.put_nowait(worker)
+
+    @asynccontextmanager
+    async def lease(self):
+
+        worker = await self.acquire()
+        token = current_worker.set(worker)
+        try:
+            yield worker
+        finally:
+            current_worker.reset(token)
+            self.release(worker)
+
+    async def close(self):
+
+        global active_pool
+
+        if self.monitor is not None:
+            self.monitor.cancel()
+            try:
+                await self.monitor
+            except asyncio.CancelledError:
+                pass
+            self.monitor = None
+
+        await asyncio.gather(*(worker.stop() for worker in self.workers), return_exceptions=True)
+
+        if active_pool is self:
+            active_pool = None
+
+
+def leased_session():
+
+    worker = current_worker.get()
+    if worker is None:
+        raise RuntimeError("No Blender worker leased, decorate the node with @uses_blender")
+
+    return worker.session
+
+
+def uses_blender(node_func):
+
+    # Run A Graph Node Only While Holding A Blender Slot And A Leased Worker
+    @functools.wraps(node_func)
+    async def wrapper(state, *args, **kwargs):
+        async with blender_slot():
+
+            # A Pipeline That Leased A Worker For Its Whole Run Keeps Its Scene On It
+            if current_worker.get() is not None:
+                return await node_func(state, *args, **kwargs)
+
+            async with active_pool.lease():
+                return await node_func(state, *args, **kwargs)
+
+    return wrapper
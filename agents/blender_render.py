@@ -0,0 +1,242 @@
+import base64
+import os
+import re
+import textwrap
+import uuid
+
+from blender_pool import uses_blender, leased_session
+from tracing import tracer
+
+
+RENDER_BEGIN = "RENDER_BASE64_BEGIN"
+RENDER_END = "RENDER_BASE64_END"
+
+# Camera Script, Identical For Every Iteration
+CAMERA_CODE = textwrap.dedent("""
+    import bpy
+
+    # Create a new camera object
+    cam_data = bpy.data.cameras.new(name="MyCamera")
+    cam_object = bpy.data.objects.new("MyCamera", cam_data)
+
+    # Set camera location and rotation
+    cam_object.location = (0, -10, 7)
+    cam_object.rotation_euler = (1.1, 0, 0)
+
+    # Link the camera to the current scene
+    bpy.context.collection.objects.link(cam_object)
+
+    # Set the new camera as the active camera
+    bpy.context.scene.camera = cam_object
+    """)
+
+# Empty The Scene Without Reloading The File, Which Would Stop The Addon's Server
+RESET_SCENE_CODE = textwrap.dedent("""
+    import bpy
+
+    for obj in list(bpy.data.objects):
+        bpy.data.objects.remove(obj, do_unlink=True)
+
+    for collection in (bpy.data.meshes, bpy.data.materials, bpy.data.cameras, bpy.data.lights,
+                       bpy.data.curves, bpy.data.images, bpy.data.node_groups, bpy.data.worlds):
+        for block in list(collection):
+            if block.users == 0:
+                collection.remove(block)
+    """)
+
+# Render Into A Private Temporary PNG Instead Of A Fixed Path
+HANDOFF_SETUP_CODE = textwrap.dedent("""
+    import os
+    import tempfile
+
+    render_path = os.path.join(tempfile.gettempdir(), {render_name!r})
+    saved_format = bpy.context.scene.render.image_settings.file_format
+    bpy.context.scene.render.image_settings.file_format = "PNG"
+    """)
+
+RESTORE_FORMAT_CODE = textwrap.dedent("""
+    bpy.context.scene.render.image_settings.file_format = saved_format
+    """)
+
+# Hand The PNG Bytes Back Over The MCP Channel And Remove The File
+HANDOFF_SEND_CODE = textwrap.dedent("""
+    import base64
+    import os
+    import tempfile
+
+    render_path = os.path.join(tempfile.gettempdir(), {render_name!r})
+    with open(render_path, "rb") as render_file:
+        render_b64 = base64.b64encode(render_file.read()).decode("ascii")
+    os.remove(render_path)
+
+    print("%s")
+    print(render_b64)
+    print("%s")
+    """ % (RENDER_BEGIN, RENDER_END))
+
+# Full-Quality Render With Whatever Settings The Generated Scene Left Behind
+RENDER_CODE = textwrap.dedent("""
+    bpy.context.scene.render.filepath = render_path
+    bpy.ops.render.render(write_still=True)
+    """)
+
+# Preview Settings For Feedback Iterations, The Final Iteration Renders At Full Quality
+# The Final Render Of Every Run Is Kept As <RENDER_DIR>/<run_id>/Render.png
+RENDER_DIR = os.environ.get("RENDER_DIR", "renders")
+
+PREVIEW_ENGINE = "BLENDER_WORKBENCH"
+PREVIEW_MAX_SIZE = 640
+PREVIEW_SAMPLES = 8
+
+# Fast Render That Restores The Scene's Own Render Settings Afterwards
+PREVIEW_RENDER_CODE = textwrap.dedent("""
+    scene = bpy.context.scene
+    render = scene.render
+
+    # Remember The Full-Quality Settings
+    saved = (render.engine, render.resolution_percentage, scene.eevee.taa_render_samples)
+    saved_cycles = None
+    if hasattr(scene, "cycles"):
+        saved_cycles = (scene.cycles.samples, scene.cycles.use_denoising)
+
+    engines = {{item.identifier for item in render.bl_rna.properties["engine"].enum_items}}
+    engine = {engine!r}
+    if engine == "EEVEE":
+        engine = "BLENDER_EEVEE_NEXT" if "BLENDER_EEVEE_NEXT" in engines else "BLENDER_EEVEE"
+
+    try:
+        render.engine = engine
+        render.resolution_percentage = max(1, min(100, int(100 * {max_size} / max(render.resolution_x, render.resolution_y))))
+        scene.eevee.taa_render_samples = {samples}
+        if saved_cycles is not None:
+            scene.cycles.samples = {samples}
+            scene.cycles.use_denoising = False
+
+        render.filepath = render_path
+        bpy.ops.render.render(write_still=True)
+
+    finally:
+        render.engine, render.resolution_percentage, scene.eevee.taa_render_samples = saved
+        if saved_cycles is not None:
+            scene.cycles.samples, scene.cycles.use_denoising = saved_cycles
+    """)
+
+
+def screenshot_code(render_name, preview=False, send=True):
+
+    render_code = RENDER_CODE
+    if preview:
+        render_code = PREVIEW_RENDER_CODE.format(
+            engine=PREVIEW_ENGINE,
+            max_size=PREVIEW_MAX_SIZE,
+            samples=PREVIEW_SAMPLES,
+        )
+
+    code = CAMERA_CODE + HANDOFF_SETUP_CODE.format(render_name=render_name) + render_code + RESTORE_FORMAT_CODE
+    if send:
+        code += HANDOFF_SEND_CODE.format(render_name=render_name)
+
+    return code
+
+
+def extract_render(result):
+
+    matches = re.findall(re.escape(RENDER_BEGIN) + r"\s*([A-Za-z0-9+/=\s]+?)\s*" + re.escape(RENDER_END), str(result))
+    if not matches:
+        return None
+
+    return "".join(matches[-1].split())
+
+
+def is_tool_error(result):
+
+    # Blender-MCP Reports Failed Scripts As Text Instead Of Raising
+    return str(result).lstrip().startswith("Error")
+
+
+async def execute_code(session, code):
+
+    # Run A Script In Blender Without An LLM In The Loop
+    result = await session.call_tool("execute_blender_code", {"code": code})
+    if is_tool_error(result):
+        raise RuntimeError(str(result))
+
+    return result
+
+
+async def take_screenshot(session, agent, fallback_hint="If it does not work try to fix and reexecute it.", preview=False):
+
+    # Every Render Gets Its Own Trace Span, Its Tool Calls Are Nested Below It
+    async with tracer.span("render", "preview" if preview else "final", preview=preview) as attributes:
+        render_b64 = await capture_render(session, agent, fallback_hint, preview)
+        attributes["image_size"] = len(render_b64) if render_b64 else 0
+        return render_b64
+
+
+async def capture_render(session, agent, fallback_hint, preview):
+
+    render_name = f"blendermcp_render_{uuid.uuid4().hex}.png"
+    code = screenshot_code(render_name, preview=preview)
+    if preview:
+        print(f"Preview render ({PREVIEW_ENGINE}, max {PREVIEW_MAX_SIZE}px).")
+
+    try:
+        result = await execute_code(session, code)
+        render_b64 = extract_render(result)
+        if render_b64 is None:
+            raise RuntimeError("Render script returned no image")
+
+        print("Screenshot taken.")
+        return render_b64
+
+    except Exception as e:
+        print(f"Direct render failed, falling back to the tool agent: {e}")
+
+    if agent is None:
+        return None
+
+    # Let The Tool Agent Repair The Script Only When The Direct Call Failed
+    # The Agent Only Renders, The Image Is Fetched Directly So It Never Enters The Model Context
+    code = screenshot_code(render_name, preview=preview, send=False)
+    try:
+        await agent.ainvoke(
+            {"messages": [{"role": "user", "content": "Execute the following Blender Python Code:\n"+code+
+            "\n"+fallback_hint}]}
+        )
+        result = await execute_code(session, HANDOFF_SEND_CODE.format(render_name=render_name))
+        render_b64 = extract_render(result)
+        if render_b64 is not None:
+            print("Screenshot taken.")
+            return render_b64
+
+        print("Error in main execution: the render script returned no image")
+
+    except Exception as e:
+        print(f"Error in main execution: {e}")
+
+    return None
+
+
+def save_render(render_b64, run_id):
+
+    # Write The Rendered PNG Next To The Other Results Of The Run
+    directory = os.path.abspath(os.path.join(RENDER_DIR, run_id or "latest"))
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, "Render.png")
+    with open(path, "wb") as f:
+        f.write(base64.b64decode(render_b64))
+
+    return path
+
+
+@uses_blender
+async def render_final(state):
+
+    # Full-Quality Render Outside The Tool Nodes, Keeps The Preview If It Fails
+    session = leased_session()
+    render_b64 = await take_screenshot(session, None, preview=False)
+    if render_b64 is not None:
+        state["render"] = render_b64
+    state["preview"] = False
+
+    return state
@@ -0,0 +1,147 @@
+import os
+import textwrap
+import time
+import uuid
+
+from blender_pool import uses_blender, leased_session
+from blender_render import RESET_SCENE_CODE, execute_code, take_screenshot
+
+
+CHECKPOINT_DIR = os.environ.get("CHECKPOINT_DIR", ".checkpoints")
+
+# Restore The Best Checkpoint When A Score Falls This Far Below The Best One
+SCORE_DROP = float(os.environ.get("CHECKPOINT_SCORE_DROP", 0.05))
+
+SAVE_CODE = textwrap.dedent("""
+    import bpy
+
+    # Copy Keeps The Open File And Its Path Untouched
+    bpy.ops.wm.save_as_mainfile(filepath={path!r}, copy=True)
+    print("Checkpoint saved")
+    """)
+
+# Append The Checkpoint Into The Emptied Scene, Reopening The File Would Stop The Addon's Server
+RESTORE_CODE = RESET_SCENE_CODE + textwrap.dedent("""
+    scene = bpy.context.scene
+    with bpy.data.libraries.load({path!r}, link=False) as (data_from, data_to):
+        data_to.objects = list(data_from.objects)
+        data_to.worlds = list(data_from.worlds)
+
+    for obj in data_to.objects:
+        if obj is not None:
+            scene.collection.objects.link(obj)
+
+    if data_to.worlds and data_to.worlds[0] is not None:
+        scene.world = data_to.worlds[0]
+
+    cameras = [obj for obj in scene.objects if obj.type == "CAMERA"]
+    if cameras:
+        scene.camera = cameras[-1]
+
+    print("Checkpoint restored")
+    """)
+
+
+def run_directory():
+
+    # One Directory Per Pipeline Run
+    name = time.strftime("%Y%m%d-%H%M%S") + "-" + uuid.uuid4().hex[:6]
+    directory = os.path.abspath(os.path.join(CHECKPOINT_DIR, name))
+    os.makedirs(directory, exist_ok=True)
+    return directory
+
+
+def best_checkpoint(state):
+
+    # Best Scoring Checkpoint, Or The Last Good One When Nothing Was Scored
+    checkpoints = state.get("checkpoints") or []
+    if not checkpoints:
+        return None
+
+    scored = [checkpoint for checkpoint in checkpoints if checkpoint["score"] is not None]
+    if scored:
+        return max(scored, key=lambda checkpoint: checkpoint["score"])
+
+    return checkpoints[-1]
+
+
+def restore_reason(state, score):
+
+    # Returns Why The Last Step Left A Broken Scene, Or None
+    if not state.get("render"):
+        return "no render"
+
+    best = best_checkpoint(state)
+    if best is not None and best["score"] is not None and score is not None and score < best["score"] - SCORE_DROP:
+        return f"score {score} dropped below the best checkpoint ({best['score']})"
+
+    return None
+
+
+@uses_blender
+async def checkpoint_or_restore(state, iteration, score=None):
+
+    session = leased_session()
+
+    # Roll Back Before The Next Attempt When This Step Broke The Scene
+    reason = restore_reason(state, score)
+    best = best_checkpoint(state)
+    if reason is not None and best is not None:
+        print(f"Restoring checkpoint {best['path']} (iteration {best['iteration']}): {reason}")
+        try:
+            await execute_code(session, RESTORE_CODE.format(path=best["path"]))
+            render_b64 = await take_screenshot(session, None, preview=state.get("preview", False))
+            if render_b64 is not None:
+                state["render"] = render_b64
+            if "code" in state:
+                state["code"] = best["code"]
+            if state.get("applied_code"):
+                state["applied_code"] = best["code"]
+            state["checkpoint"] = best["path"]
+
+        except Exception as e:
+            print(f"Error in main execution: {e}")
+
+        return state
+
+    # Unchanged Or Broken Scenes Are Not Worth A Checkpoint
+    if reason is not None or state.get("skip_reason"):
+        return state
+
+    if not state.get("checkpoint_dir"):
+        state["checkpoint_dir"] = run_directory()
+    path = os.path.join(state["checkpoint_dir"], f"iteration_{iteration:02d}.blend")
+
+    try:
+        await execute_code(session, SAVE_CODE.format(path=path))
+    except Exception as e:
+        print(f"Error in main execution: {e}")
+        return state
+
+    state["checkpoints"] = list(state.get("checkpoints") or []) + [{
+        "path": path,
+        "iteration": iteration,
+        "score": score,
+        "code": state.get("code", ""),
+    }]
+    state["checkpoint"] = path
+    print(f"Checkpoint saved: {path}")
+
+    return state
+
+
+@uses_blender
+async def restore_scene(state):
+
+    # Rebuild The Scene Of A Resumed Run From Its Latest Checkpoint
+    path = state.get("checkpoint")
+    if not path or not os.path.exists(path):
+        return state
+
+    print(f"Restoring scene from checkpoint {path}")
+    try:
+        await execute_code(leased_session(), RESTORE_CODE.format(path=path))
+    except Exception as e:
+        print(f"Error in main execution: {e}")
+
+    return state
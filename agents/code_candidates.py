@@ -0,0 +1,145 @@
+import asyncio
+import os
+
+import blender_pool
+from asset_prefetch import asset_prefetcher, script_assets
+from blender_render import RESET_SCENE_CODE, execute_code, take_screenshot
+from concurrency import blender_slot
+from image_similarity import compare, similarity_gate, to_array
+from llm_pool import describe, gemini_chat, ollama_chat
+from llm_stream import extract_code, stream_llm, syntax_error
+from loop_controller import image_score
+
+
+# Code Scripts Sampled Per Code Node, 1 Keeps The Single Sequential Sample
+CANDIDATES = int(os.environ.get("CODE_CANDIDATES", 1))
+
+# Temperature Of Candidates 2..N When The Node's Own Chat Is Deterministic, 0 Turns Best-Of-N Off For Such Nodes
+CANDIDATE_TEMPERATURE = float(os.environ.get("CODE_CANDIDATE_TEMPERATURE", 0.7))
+
+
+async def lease_spare(pool, count):
+
+    # Pipelines Hold Their Own Worker For The Whole Run, Only Workers Idle Right Now Take Candidates
+    if pool is None or pool.idle is None:
+        return []
+
+    workers = []
+    while len(workers) < count:
+        worker = await pool.try_acquire()
+        if worker is None:
+            break
+        workers.append(worker)
+
+    return workers
+
+
+def sampling_chat(chat):
+
+    # A Temperature-0 Chat Would Return N Copies Of One Script, Extra Candidates Come From A Warmer Client Of The Same Model
+    params = describe(chat)
+    if params["temperature"]:
+        return chat
+    if not CANDIDATE_TEMPERATURE:
+        return None
+
+    if params["provider"] == "gemini":
+        return gemini_chat(params["model"], temperature=CANDIDATE_TEMPERATURE, max_tokens=params["max_tokens"])
+    return ollama_chat(params["model"], temperature=CANDIDATE_TEMPERATURE, base_url=params["base_url"], max_tokens=params["max_tokens"])
+
+
+def code_block_ready(label):
+
+    # Runs While The Model Is Still Writing: Check Each Closed Block And Fetch The Assets It Names
+    def check(block):
+        error = syntax_error(block)
+        if error is not None:
+            print(f"\n[{label}] Code block has a syntax error ({error}), waiting for more output.\n")
+            return
+
+        asset_prefetcher.start(block, script_assets)
+
+    return check
+
+
+async def evaluate(code, reference_path, workers):
+
+    # Run One Candidate On A Fresh Scene Of One Of The Spare Workers And Score The Preview Render
+    worker = await workers.get()
+    try:
+        async with blender_slot():
+            try:
+                await execute_code(worker.session, RESET_SCENE_CODE)
+                await execute_code(worker.session, code)
+                render_b64 = await take_screenshot(worker.session, None, preview=True)
+            except Exception as e:
+                return 0.0, f"port {worker.port}, failed: {str(e)[:200]}"
+
+            finally:
+                # Hand The Worker Back With An Empty Scene
+                try:
+                    await execute_code(worker.session, RESET_SCENE_CODE)
+                except Exception as e:
+                    print(f"Error in main execution: {e}")
+
+    finally:
+        workers.put_nowait(worker)
+
+    if render_b64 is None:
+        return 0.0, f"port {worker.port}, no render"
+
+    # Without A Reference Image Every Script That Runs Is Equally Good
+    if not reference_path or not os.path.exists(reference_path):
+        return 1.0, f"port {worker.port}, executed"
+
+    scores = compare(to_array(render_b64), similarity_gate.reference(reference_path))
+    return round(image_score(scores), 4), f"port {worker.port}, {scores}"
+
+
+async def best_code(chat, llm_input, label, reference_path="", candidates=CANDIDATES):
+
+    sampler = sampling_chat(chat) if candidates > 1 else None
+    if sampler is None:
+        return await stream_llm(chat, llm_input, label, on_code_block=code_block_ready(label))
+
+    # Sample All Candidates Concurrently, The First One With The Node's Own Settings
+    texts = await asyncio.gather(*(
+        stream_llm(chat if k == 0 else sampler, llm_input, f"{label} Candidate {k + 1}",
+                   on_code_block=code_block_ready(f"{label} Candidate {k + 1}"), echo=False)
+        for k in range(candidates)
+    ))
+    codes = [extract_code(text) for text in texts]
+
+    runnable = [k for k, code in enumerate(codes) if code is not None]
+    if not runnable:
+        print(f"No {label} candidate produced a complete code block, keeping the first one.")
+        return texts[0]
+
+    # Lease Without Waiting, Batch Jobs Hold Their Workers Until They Finish
+    pool = blender_pool.active_pool
+    leased = await lease_spare(pool, len(runnable))
+    if not leased:
+        print(f"No spare Blender worker for scoring, keeping {label} candidate {runnable[0] + 1}.")
+        return texts[runnable[0]]
+
+    # Execute And Score The Candidates In Parallel, Fewer Workers Than Candidates Take Them In Turns
+    workers = asyncio.Queue()
+    for worker in leased:
+        workers.put_nowait(worker)
+    try:
+        results = await asyncio.gather(*(evaluate(codes[k], reference_path, workers) for k in runnable), return_exceptions=True)
+    finally:
+        for worker in leased:
+            pool.release(worker)
+
+    best = None
+    for k, result in zip(runnable, results):
+        if isinstance(result, Exception):
+            result = (0.0, f"failed: {result}")
+        score, note = result
+        print(f"{label} candidate {k + 1}: score {score} ({note})")
+        if best is None or score > best[1]:
+            best = (k, score)
+
+    print(f"Advancing {label} candidate {best[0] + 1}.")
+    return texts[best[0]]
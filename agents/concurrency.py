@@ -0,0 +1,37 @@
+from contextlib import asynccontextmanager
+import asyncio
+
+
+# Limits Shared By All Pipelines In This Process, None Means Unlimited
+llm_limit = None
+blender_limit = None
+
+
+def configure(llm=None, blender=None):
+
+    global llm_limit, blender_limit
+    llm_limit = asyncio.Semaphore(llm) if llm else None
+    blender_limit = asyncio.Semaphore(blender) if blender else None
+
+
+@asynccontextmanager
+async def llm_slot():
+
+    if llm_limit is None:
+        yield
+        return
+
+    async with llm_limit:
+        yield
+
+
+@asynccontextmanager
+async def blender_slot():
+
+    if blender_limit is None:
+        yield
+        return
+
+    async with blender_limit:
+        yield
+
@@ -0,0 +1,61 @@
+from blender_render import render_final, save_render
+from checkpoints import checkpoint_or_restore
+from loop_controller import LoopController
+from usage_tracker import usage_tracker
+
+
+# Graph Nodes Shared By All Variants: Score Each Pass, Then Loop Back Or Finish
+
+
+async def loop_step(state, reference_path, title="Feedback Loop"):
+
+    # The Controller Lives In MyState, So A Resumed Run Continues With Its History
+    controller = LoopController.from_state(state.get("loop"), reference_path=reference_path, preview=state.get("preview", False))
+    controller.observe(state)
+
+    # Save A Checkpoint Of A Good Scene, Roll Back A Broken One Before The Next Attempt
+    state = await checkpoint_or_restore(state, controller.iterations, controller.history[-1]["score"])
+
+    if controller.should_continue():
+
+        # Preview Renders Until The Last Iteration The Limits Allow
+        state["preview"] = controller.preview and not controller.is_last_allowed()
+        i = controller.next_iteration()
+
+        banner = f"+ {title} iteration: {str(i+1)} +"
+        print("\n")
+        print("+" * len(banner))
+        print(banner)
+        print("+" * len(banner))
+        print("\n")
+
+    state["loop"] = controller.to_state()
+    state["iterations"] = controller.iterations
+    state["stop_reason"] = controller.stop_reason
+
+    return state
+
+
+def route(state):
+
+    # Back To The First Node Until The Controller Gives A Stop Reason
+    return "finish" if state.get("stop_reason") else "again"
+
+
+async def finish_step(state, reference_path):
+
+    # Early Stops Leave A Preview Behind, Render The Result At Full Quality
+    if state.get("preview"):
+        state = await render_final(state)
+
+    # The Result Of The Run, As Render.png Was Before The Renders Moved Into The State
+    if state.get("render"):
+        try:
+            print(f"Final render saved: {save_render(state['render'], state.get('run_id', ''))}")
+        except Exception as e:
+            print(f"Error in main execution: {e}")
+
+    LoopController.from_state(state.get("loop"), reference_path=reference_path).print_summary()
+    usage_tracker.print_summary(state.get("run_id", ""))
+
+    return state
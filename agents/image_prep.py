@@ -0,0 +1,246 @@
+from PIL import Image
+
+import base64
+import mmap
+import os
+import struct
+import time
+from io import BytesIO
+
+from llm_pool import describe
+
+
+# Largest Side And Encoding Per Vision Model, Matched By Model Name Prefix
+# The Models Downsample Internally, Anything Above Their Input Size Is Wasted Upload
+PROFILES = {
+    "gemma3": {"max_size": 896, "format": "JPEG", "quality": 90, "max_bytes": 1536 * 1024},
+    "llama4": {"max_size": 1120, "format": "JPEG", "quality": 90, "max_bytes": 1536 * 1024},
+    "gemini": {"max_size": 1536, "format": "WEBP", "quality": 90, "max_bytes": 2048 * 1024},
+}
+DEFAULT_PROFILE = {"max_size": 1024, "format": "JPEG", "quality": 90, "max_bytes": 1536 * 1024}
+
+# Renders Have Flat Colours And Sharp Edges, Keep Them Lossless
+RENDER_FORMAT = "PNG"
+
+MIME_TYPES = {
+    "PNG": "image/png",
+    "JPEG": "image/jpeg",
+    "WEBP": "image/webp",
+}
+
+# Every Vision Model Here Accepts These As They Are
+PASSTHROUGH_FORMATS = {"PNG", "JPEG"}
+
+# Files Above This Size Are Read Through mmap Instead Of Into A Buffer
+MMAP_THRESHOLD = 1024 * 1024
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+JPEG_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+# Running Totals Over All Prepared Images
+stats = {"images": 0, "passthrough": 0, "bytes_in": 0, "bytes_out": 0, "seconds": 0.0}
+
+
+def model_name(chat):
+
+    if chat is None:
+        return ""
+    if isinstance(chat, str):
+        return chat
+
+    try:
+        return describe(chat)["model"]
+    except KeyError:
+        return getattr(chat, "model", "") or getattr(chat, "model_name", "")
+
+
+def profile_for(chat):
+
+    name = model_name(chat).lower()
+    for prefix, profile in PROFILES.items():
+        if name.startswith(prefix) or name.startswith("models/" + prefix):
+            return profile
+
+    return DEFAULT_PROFILE
+
+
+def source_size(image):
+
+    # Size Of What The Caller Handed In, Used To Report The Savings
+    if isinstance(image, (bytes, bytearray)):
+        return len(image)
+
+    filename = getattr(image, "filename", "")
+    if filename and os.path.exists(filename):
+        return os.path.getsize(filename)
+
+    # In-Memory Image Without A File, Compare Against The Raw Pixels
+    return image.width * image.height * len(image.getbands())
+
+
+def sniff(header):
+
+    # Format And Size From The File Header, Without Decoding Any Pixels
+    if header[:8] == PNG_SIGNATURE and header[12:16] == b"IHDR":
+        width, height = struct.unpack(">II", header[16:24])
+        return "PNG", (width, height)
+
+    if header[:2] != b"\xff\xd8":
+        return None, None
+
+    # Walk The JPEG Segments Up To The Start-Of-Frame Marker
+    offset = 2
+    while offset + 9 <= len(header):
+        if header[offset] != 0xFF:
+            return None, None
+        marker = header[offset + 1]
+        if marker == 0xFF:
+            offset += 1
+            continue
+        if marker in JPEG_SOF_MARKERS:
+            height, width = struct.unpack(">HH", header[offset + 5:offset + 9])
+            return "JPEG", (width, height)
+        if marker == 0xD8 or 0xD0 <= marker <= 0xD7:
+            offset += 2
+            continue
+        offset += 2 + struct.unpack(">H", header[offset + 2:offset + 4])[0]
+
+    return None, None
+
+
+def compatible(image_format, size, byte_count, profile, render):
+
+    if image_format is None or max(size) > profile["max_size"]:
+        return False
+
+    # Renders Are Sent As PNG Anyway, Re-Encoding Would Not Shrink Them
+    if render:
+        return image_format == RENDER_FORMAT
+
+    return image_format in PASSTHROUGH_FORMATS and byte_count <= profile["max_bytes"]
+
+
+def passthrough_file(path, profile, render):
+
+    # Base64 The Original File Bytes, Or None If It Needs Decoding
+    byte_count = os.path.getsize(path)
+    with open(path, "rb") as f:
+        if byte_count < MMAP_THRESHOLD:
+            data = f.read()
+            image_format, size = sniff(data)
+            if not compatible(image_format, size, byte_count, profile, render):
+                return None
+            return image_format, size, byte_count, base64.b64encode(data).decode("ascii")
+
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            image_format, size = sniff(data[:65536])
+            if not compatible(image_format, size, byte_count, profile, render):
+                return None
+            return image_format, size, byte_count, base64.b64encode(data).decode("ascii")
+
+
+def passthrough_b64(image_b64, profile, render):
+
+    # The Header Sits In The First Few Base64 Characters, The Rest Stays Encoded
+    image_format, size = sniff(base64.b64decode(image_b64[:44]))
+    byte_count = len(image_b64) * 3 // 4 - image_b64.count("=", -2)
+    if not compatible(image_format, size, byte_count, profile, render):
+        return None
+
+    return image_format, size, byte_count, image_b64
+
+
+def encode(pil_image, image_format, quality):
+
+    # JPEG Has No Alpha Channel, WebP And PNG Keep It
+    if image_format == "JPEG" and pil_image.mode != "RGB":
+        pil_image = pil_image.convert("RGB")
+    elif pil_image.mode not in ("RGB", "RGBA", "L", "LA"):
+        pil_image = pil_image.convert("RGBA")
+
+    buffered = BytesIO()
+    if image_format == "PNG":
+        pil_image.save(buffered, format="PNG", optimize=False, compress_level=6)
+    else:
+        pil_image.save(buffered, format=image_format, quality=quality)
+
+    return buffered.getvalue()
+
+
+def prepare_image(image, chat=None, render=False):
+
+    # Accept A PIL Image Or The Base64 PNG Handed Back By Blender
+    started = time.perf_counter()
+    profile = profile_for(chat)
+
+    # Fast Path: Hand Compatible Images Over Without Decoding Them
+    passthrough = None
+    try:
+        if isinstance(image, str):
+            passthrough = passthrough_b64(image, profile, render)
+        elif getattr(image, "filename", "") and os.path.exists(image.filename):
+            passthrough = passthrough_file(image.filename, profile, render)
+    except (OSError, ValueError, struct.error) as e:
+        print(f"Error in main execution: {e}")
+
+    if passthrough is not None:
+        image_format, size, byte_count, image_b64 = passthrough
+        seconds = time.perf_counter() - started
+        stats["images"] += 1
+        stats["passthrough"] += 1
+        stats["bytes_in"] += byte_count
+        stats["bytes_out"] += byte_count
+        stats["seconds"] += seconds
+
+        print(f"Image passed through for {model_name(chat) or 'default profile'}: "
+              f"{size[0]}x{size[1]} {image_format}, {byte_count / 1024:.0f} KB, "
+              f"no re-encode in {seconds * 1000:.0f} ms")
+
+        return image_b64, MIME_TYPES[image_format]
+
+    if isinstance(image, str):
+        image = base64.b64decode(image)
+    if isinstance(image, (bytes, bytearray)):
+        bytes_in = len(image)
+        pil_image = Image.open(BytesIO(image))
+    else:
+        bytes_in = source_size(image)
+        pil_image = image
+
+    image_format = RENDER_FORMAT if render else profile["format"]
+
+    # Downscale To The Model's Input Size, Never Upscale
+    original_size = pil_image.size
+    max_size = profile["max_size"]
+    if max(original_size) > max_size:
+        pil_image = pil_image.copy()
+        pil_image.thumbnail((max_size, max_size), Image.LANCZOS)
+
+    data = encode(pil_image, image_format, profile["quality"])
+    image_b64 = base64.b64encode(data).decode("utf-8")
+
+    seconds = time.perf_counter() - started
+    stats["images"] += 1
+    stats["bytes_in"] += bytes_in
+    stats["bytes_out"] += len(data)
+    stats["seconds"] += seconds
+
+    print(f"Image prepared for {model_name(chat) or 'default profile'}: "
+          f"{original_size[0]}x{original_size[1]} -> {pil_image.size[0]}x{pil_image.size[1]} {image_format}, "
+          f"{bytes_in / 1024:.0f} KB -> {len(data) / 1024:.0f} KB "
+          f"({(bytes_in - len(data)) / 1024:.0f} KB saved) in {seconds * 1000:.0f} ms")
+
+    return image_b64, MIME_TYPES[image_format]
+
+
+def print_image_stats():
+
+    if stats["images"] == 0:
+        return
+
+    print("\n")
+    print("Image Preparation:")
+    print(f"{stats['images']} images ({stats['passthrough']} passed through), {stats['bytes_in'] / 1024:.0f} KB -> {stats['bytes_out'] / 1024:.0f} KB "
+          f"({(stats['bytes_in'] - stats['bytes_out']) / 1024:.0f} KB saved), "
+          f"{stats['seconds'] * 1000:.0f} ms encoding")
+    print("\n")
@@ -0,0 +1,133 @@
+from PIL import Image
+import numpy as np
+
+import base64
+import os
+from io import BytesIO
+
+
+# Consecutive Renders Above These Scores Count As Unchanged
+UNCHANGED_SSIM = float(os.environ.get("SIMILARITY_UNCHANGED_SSIM", 0.99))
+UNCHANGED_HISTOGRAM = float(os.environ.get("SIMILARITY_UNCHANGED_HISTOGRAM", 0.01))
+UNCHANGED_EDGES = float(os.environ.get("SIMILARITY_UNCHANGED_EDGES", 0.01))
+
+# A Render This Close To The Reference Image Needs No Further Feedback
+REFERENCE_SSIM = float(os.environ.get("SIMILARITY_REFERENCE_SSIM", 0.9))
+REFERENCE_HISTOGRAM = float(os.environ.get("SIMILARITY_REFERENCE_HISTOGRAM", 0.05))
+
+# Images Are Compared On A Small Grayscale Copy
+COMPARE_SIZE = 256
+SSIM_WINDOW = 7
+HISTOGRAM_BINS = 64
+
+
+def to_array(image):
+
+    # Accept A Base64 Render Or A PIL Image
+    if isinstance(image, str):
+        pil_image = Image.open(BytesIO(base64.b64decode(image)))
+    else:
+        pil_image = image
+
+    small = pil_image.convert("L").resize((COMPARE_SIZE, COMPARE_SIZE), Image.BILINEAR)
+    return np.asarray(small, dtype=np.float64) / 255.0
+
+
+def box_filter(array, window):
+
+    # Mean Over Every Window Via A Summed-Area Table
+    padded = np.pad(array, ((1, 0), (1, 0)))
+    table = padded.cumsum(axis=0).cumsum(axis=1)
+    sums = table[window:, window:] - table[:-window, window:] - table[window:, :-window] + table[:-window, :-window]
+    return sums / (window * window)
+
+
+def ssim(a, b, window=SSIM_WINDOW):
+
+    c1 = 0.01 ** 2
+    c2 = 0.03 ** 2
+
+    mean_a = box_filter(a, window)
+    mean_b = box_filter(b, window)
+    var_a = box_filter(a * a, window) - mean_a * mean_a
+    var_b = box_filter(b * b, window) - mean_b * mean_b
+    covariance = box_filter(a * b, window) - mean_a * mean_b
+
+    score = ((2 * mean_a * mean_b + c1) * (2 * covariance + c2)) / ((mean_a ** 2 + mean_b ** 2 + c1) * (var_a + var_b + c2))
+    return float(score.mean())
+
+
+def histogram_distance(a, b, bins=HISTOGRAM_BINS):
+
+    # Half The L1 Distance Of The Normalised Histograms, 0 Identical And 1 Disjoint
+    hist_a, _ = np.histogram(a, bins=bins, range=(0.0, 1.0))
+    hist_b, _ = np.histogram(b, bins=bins, range=(0.0, 1.0))
+    hist_a = hist_a / max(hist_a.sum(), 1)
+    hist_b = hist_b / max(hist_b.sum(), 1)
+    return float(np.abs(hist_a - hist_b).sum() / 2)
+
+
+def edge_map(array):
+
+    # Gradient Magnitude, Thresholded At Twice Its Mean
+    gx = np.abs(np.diff(array, axis=1))[:-1, :]
+    gy = np.abs(np.diff(array, axis=0))[:, :-1]
+    magnitude = gx + gy
+    return magnitude > max(magnitude.mean() * 2, 0.02)
+
+
+def edge_distance(a, b):
+
+    # Share Of Pixels That Are An Edge In Exactly One Image
+    edges_a = edge_map(a)
+    edges_b = edge_map(b)
+    return float(np.logical_xor(edges_a, edges_b).mean())
+
+
+def compare(a, b):
+    return {
+        "ssim": round(ssim(a, b), 4),
+        "histogram": round(histogram_distance(a, b), 4),
+        "edges": round(edge_distance(a, b), 4),
+    }
+
+
+class SimilarityGate:
+
+    # Decide Locally Whether A New Render Is Worth Another Round Of LLM Calls
+    def __init__(self):
+        self.references = {}
+
+    def reference(self, file_path):
+
+        if file_path not in self.references:
+            with Image.open(file_path) as pil_image:
+                self.references[file_path] = to_array(pil_image)
+        return self.references[file_path]
+
+    def check(self, render_b64, previous_b64="", reference_path=""):
+
+        # Returns The Reason For Skipping, Or None If The LLMs Should Run
+        try:
+            render = to_array(render_b64)
+
+            if previous_b64:
+                scores = compare(render, to_array(previous_b64))
+                if (scores["ssim"] >= UNCHANGED_SSIM
+                        and scores["histogram"] <= UNCHANGED_HISTOGRAM
+                        and scores["edges"] <= UNCHANGED_EDGES):
+                    return f"render unchanged since the previous iteration {scores}"
+
+            if reference_path and os.path.exists(reference_path):
+                scores = compare(render, self.reference(reference_path))
+                if scores["ssim"] >= REFERENCE_SSIM and scores["histogram"] <= REFERENCE_HISTOGRAM:
+                    return f"render matches the reference image {scores}"
+
+        except Exception as e:
+            print(f"Error in main execution: {e}")
+
+        return None
+
+
+# Shared Gate, Reference Images Are Only Loaded Once
+similarity_gate = SimilarityGate()
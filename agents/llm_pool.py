@@ -0,0 +1,76 @@
+import os
+
+from tracing import tracer
+from usage_tracker import usage_tracker
+
+
+DEFAULT_OLLAMA_URL = "http://localhost:11434"
+
+# Shared Chat Clients, Keyed By (Provider, Model, Base Url, Temperature, Max Tokens[, Max Retries])
+# Reusing One Client Keeps Its HTTP Connection Pool / Gemini Channel Alive Across Nodes And Iterations
+_clients = {}
+_params = {}
+
+
+def ollama_chat(model, temperature=0.0, base_url=None, max_tokens=None):
+
+    # Same Host With Or Without Explicit Url Shares One Client
+    if base_url is None:
+        base_url = os.environ.get("OLLAMA_HOST", DEFAULT_OLLAMA_URL)
+
+    key = ("ollama", model, base_url, temperature, max_tokens)
+    if key not in _clients:
+        from langchain_ollama import ChatOllama
+
+        kwargs = {}
+        if max_tokens is not None:
+            kwargs["num_predict"] = max_tokens
+
+        _clients[key] = ChatOllama(
+            model=model,
+            base_url=base_url,
+            temperature=temperature,
+            callbacks=[usage_tracker.handler("ollama", model), tracer.handler("ollama", model)],
+            **kwargs,
+        )
+        _params[id(_clients[key])] = key
+
+    return _clients[key]
+
+
+def gemini_chat(model, temperature=0.0, max_tokens=None, max_retries=2):
+
+    key = ("gemini", model, None, temperature, max_tokens, max_retries)
+    if key not in _clients:
+        from langchain_google_genai import ChatGoogleGenerativeAI
+
+        _clients[key] = ChatGoogleGenerativeAI(
+            model=model,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            timeout=None,
+            max_retries=max_retries,
+            callbacks=[usage_tracker.handler("gemini", model), tracer.handler("gemini", model)],
+        )
+        _params[id(_clients[key])] = key
+
+    return _clients[key]
+
+
+def describe(chat):
+
+    # Model Parameters Of A Pooled Client, Used As Part Of Cache Keys
+    # The Retry Policy Does Not Change The Response, It Stays Out Of Cache Keys
+    provider, model, base_url, temperature, max_tokens = _params[id(chat)][:5]
+    return {
+        "provider": provider,
+        "model": model,
+        "base_url": base_url,
+        "temperature": temperature,
+        "max_tokens": max_tokens,
+    }
+
+
+def clear():
+    _clients.clear()
+    _params.clear()
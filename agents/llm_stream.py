@@ -0,0 +1,248 @@
+import re
+
+from llm_pool import describe
+from concurrency import llm_slot
+from response_cache import response_cache
+
+
+# Stream Model Output Token By Token, Set To False To Wait For Full Responses
+STREAMING = True
+
+THINK_OPEN = "<think>"
+THINK_CLOSE = "</think>"
+
+# ```python, ```Python And ```py Fences
+CODE_BLOCK = re.compile(r"```(?:python|py)[ \t]*\n(.*?)```", re.DOTALL | re.IGNORECASE)
+
+
+def chunk_text(content):
+
+    # Gemini Returns A List Of Parts, Ollama A Plain String
+    if isinstance(content, str):
+        return content
+
+    parts = []
+    for part in content:
+        if isinstance(part, str):
+            parts.append(part)
+        elif isinstance(part, dict) and part.get("type") == "text":
+            parts.append(part.get("text", ""))
+
+    return "".join(parts)
+
+
+def strip_think(text):
+    return re.sub(r'<think>.*?</think>\s*', '', text, flags=re.DOTALL)
+
+
+def syntax_error(code):
+
+    # Cheap Check Before The Code Reaches Blender
+    try:
+        compile(code, "<llm_code>", "exec")
+    except SyntaxError as e:
+        return f"line {e.lineno}: {e.msg}"
+
+    return None
+
+
+def extract_code(text):
+
+    # Last Complete Block That Compiles
+    for block in reversed(CODE_BLOCK.findall(text)):
+        if syntax_error(block) is None:
+            return block
+
+    return None
+
+
+class ThinkFilter:
+
+    # Strip <think>...</think> Sections While The Response Is Still Arriving
+    def __init__(self):
+        self.pending = ""
+        self.in_think = False
+        self.strip_space = False
+
+    def feed(self, chunk):
+
+        self.pending += chunk
+        visible = ""
+
+        while self.pending:
+            if self.in_think:
+                end = self.pending.find(THINK_CLOSE)
+                if end == -1:
+                    # Keep A Possible Partial Closing Tag For The Next Chunk
+                    self.pending = self.pending[-(len(THINK_CLOSE) - 1):]
+                    break
+
+                self.pending = self.pending[end + len(THINK_CLOSE):]
+                self.in_think = False
+                self.strip_space = True
+                continue
+
+            if self.strip_space:
+                self.pending = self.pending.lstrip()
+                if not self.pending:
+                    break
+                self.strip_space = False
+
+            start = self.pending.find(THINK_OPEN)
+            if start != -1:
+                visible += self.pending[:start]
+                self.pending = self.pending[start + len(THINK_OPEN):]
+                self.in_think = True
+                continue
+
+            # Hold Back A Tail That Could Still Become "<think>"
+            hold = 0
+            for size in range(1, len(THINK_OPEN)):
+                if self.pending.endswith(THINK_OPEN[:size]):
+                    hold = size
+
+            visible += self.pending[:len(self.pending) - hold]
+            self.pending = self.pending[len(self.pending) - hold:]
+            break
+
+        return visible
+
+    def flush(self):
+
+        # Drop An Unclosed Think Section
+        rest = "" if self.in_think else self.pending
+        self.pending = ""
+        self.in_think = False
+        return rest
+
+
+class CodeBlockWatcher:
+
+    # Report Every ```python Block As Soon As Its Closing Fence Arrives
+    def __init__(self):
+        self.text = ""
+        self.position = 0
+
+    def feed(self, chunk):
+
+        self.text += chunk
+        found = []
+
+        for match in CODE_BLOCK.finditer(self.text, self.position):
+            found.append(match.group(1))
+            self.position = match.end()
+
+        return found
+
+
+def chat_params(runnable):
+
+    # Image Chains End In The Pooled Chat Model
+    return describe(getattr(runnable, "last", runnable))
+
+
+def cache_key(runnable, llm_input):
+
+    if isinstance(llm_input, dict):
+        return response_cache.key(chat_params(runnable), llm_input["text"], llm_input.get("image"))
+
+    return response_cache.key(chat_params(runnable), llm_input)
+
+
+async def stream_llm(runnable, llm_input, label, on_code_block=None, cache_node=None, echo=True):
+
+    # Serve Repeated Requests From The Response Cache If The Node Opted In
+    key = None
+    if response_cache.is_enabled(cache_node, chat_params(runnable)):
+        key = cache_key(runnable, llm_input)
+        cached = response_cache.get(cache_node, key)
+        if cached is not None:
+            print("\n")
+            print(f"{label} Output (cached):")
+            print("\n")
+            print(cached)
+            print("\n")
+
+            for block in CODE_BLOCK.findall(cached):
+                if on_code_block is not None:
+                    on_code_block(block)
+
+            return cached
+
+    async with llm_slot():
+        text = await generate(runnable, llm_input, label, on_code_block, echo)
+
+    if key is not None and text:
+        response_cache.put(cache_node, key, text)
+
+    return text
+
+
+async def generate(runnable, llm_input, label, on_code_block=None, echo=True):
+
+    # Concurrent Generations Print Their Output Once Finished Instead Of Interleaving Tokens
+    if echo:
+        print("\n")
+        print(f"{label} Output:")
+        print("\n")
+
+    # Fall Back To One Blocking Response
+    if not STREAMING:
+        result = await runnable.ainvoke(llm_input)
+        text = strip_think(chunk_text(result.content))
+        if not echo:
+            print("\n")
+            print(f"{label} Output:")
+            print("\n")
+        print(text)
+        print("\n")
+
+        for block in CODE_BLOCK.findall(text):
+            if on_code_block is not None:
+                on_code_block(block)
+
+        return text
+
+    # Generate Until The End Of The Response, Scripts Can Span Several Code Blocks
+    # Each Closed Block Is Handed To on_code_block Right Away, The Caller Still Gets The Whole Text
+    think_filter = ThinkFilter()
+    watcher = CodeBlockWatcher()
+    text = ""
+
+    stream = runnable.astream(llm_input)
+    try:
+        async for chunk in stream:
+            visible = think_filter.feed(chunk_text(chunk.content))
+            if not visible:
+                continue
+
+            if echo:
+                print(visible, end="", flush=True)
+            text += visible
+
+            for block in watcher.feed(visible):
+                if on_code_block is not None:
+                    on_code_block(block)
+
+        rest = think_filter.flush()
+        if echo:
+            print(rest, end="", flush=True)
+        text += rest
+
+        for block in watcher.feed(rest):
+            if on_code_block is not None:
+                on_code_block(block)
+
+    finally:
+        # Close The Stream So The Server Stops Generating If The Node Is Cancelled
+        await stream.aclose()
+
+    if not echo:
+        print("\n")
+        print(f"{label} Output:")
+        print("\n")
+        print(text)
+
+    print("\n")
+
+    return text
@@ -0,0 +1,201 @@
+import os
+import re
+import time
+
+from image_similarity import compare, similarity_gate, to_array
+from usage_tracker import usage_tracker
+
+
+# The Original Pipeline Always Ran 4 Feedback Iterations, The Controller Allows Up To 8 And Usually Stops Earlier
+# LOOP_MAX_ITERATIONS=4 LOOP_MIN_ITERATIONS=4 Reproduces The Baseline, Every Stop Rule Waits For The Minimum
+MAX_ITERATIONS = int(os.environ.get("LOOP_MAX_ITERATIONS", 8))
+MIN_ITERATIONS = int(os.environ.get("LOOP_MIN_ITERATIONS", 1))
+
+# Score In [0, 1] At Which The Scene Counts As Done
+TARGET_SCORE = float(os.environ.get("LOOP_TARGET_SCORE", 0.9))
+
+# Stop When The Best Score Improved By Less Than This For PATIENCE Iterations
+MIN_IMPROVEMENT = float(os.environ.get("LOOP_MIN_IMPROVEMENT", 0.01))
+PATIENCE = int(os.environ.get("LOOP_PATIENCE", 2))
+
+# Consecutive Renders Closer Than This Mean The Scene Stopped Changing
+MIN_RENDER_CHANGE = float(os.environ.get("LOOP_MIN_RENDER_CHANGE", 0.005))
+
+# Budgets Per Run, 0 Means Unlimited
+TIME_BUDGET = float(os.environ.get("LOOP_TIME_BUDGET", 0))
+TOKEN_BUDGET = int(os.environ.get("LOOP_TOKEN_BUDGET", 0))
+
+# Controller Fields Kept In The Graph State Between Iterations
+STATE_FIELDS = ("started", "iterations", "tokens", "history", "best_score", "stale", "stop_reason", "preview")
+
+# Appended To Every Feedback Vision Prompt, Without A Reference Image The Loop Stops On This Score
+SCORE_INSTRUCTION = """
+            Finish your answer with one line in the format "Score: x/10", rating how closely the image matches the description.
+            """
+
+# "Score: 7/10", "Similarity: 85%", "rating = 0.8"
+SCORE_PATTERN = re.compile(r"(?:score|similarity|rating)\s*[:=]?\s*\**\s*(\d+(?:\.\d+)?)\s*(%|/\s*100|/\s*10)?", re.IGNORECASE)
+
+
+def vision_score(text):
+
+    # Last Numeric Score The Vision Model Wrote, Scaled To [0, 1]
+    matches = SCORE_PATTERN.findall(text or "")
+    if not matches:
+        return None
+
+    number, scale = matches[-1]
+    value = float(number)
+    scale = scale.replace(" ", "")
+    if scale in ("%", "/100"):
+        value /= 100
+    elif scale == "/10":
+        value /= 10
+    elif "." not in number or value > 1:
+        # A Bare Integer Like "rating 1" Is No Score
+        return None
+
+    return max(0.0, min(1.0, value))
+
+
+def image_score(scores):
+
+    # Combine The Local Metrics Into One Similarity, 1 Means Identical
+    return (2 * scores["ssim"] + (1 - scores["histogram"]) + (1 - scores["edges"])) / 4
+
+
+class LoopController:
+
+    # Decide After Every Feedback Iteration Whether Another One Is Worth Running
+    def __init__(self, reference_path="", max_iterations=MAX_ITERATIONS, min_iterations=MIN_ITERATIONS,
+                 target_score=TARGET_SCORE, min_improvement=MIN_IMPROVEMENT, patience=PATIENCE,
+                 time_budget=TIME_BUDGET, token_budget=TOKEN_BUDGET, preview=False):
+        self.reference_path = reference_path
+        self.max_iterations = max_iterations
+        self.min_iterations = min_iterations
+        self.target_score = target_score
+        self.min_improvement = min_improvement
+        self.patience = patience
+        self.time_budget = time_budget
+        self.token_budget = token_budget
+
+        self.started = time.time()
+        self.iterations = 0
+        self.tokens = 0
+        self.history = []
+        self.best_score = None
+        self.stale = 0
+        self.stop_reason = ""
+
+        # Whether The Run Uses Preview Renders Before Its Last Iteration
+        self.preview = preview
+
+    @classmethod
+    def from_state(cls, loop, reference_path="", preview=False):
+
+        # Rebuild The Controller From The Fields Saved In MyState, A Fresh One For The First Pass
+        controller = cls(reference_path=reference_path, preview=preview)
+        for field in STATE_FIELDS:
+            if loop and field in loop:
+                value = loop[field]
+                setattr(controller, field, list(value) if isinstance(value, list) else value)
+        return controller
+
+    def to_state(self):
+        return {field: getattr(self, field) for field in STATE_FIELDS}
+
+    def score(self, state):
+
+        # Prefer The Local Comparison With The Reference, Fall Back To The Vision Model's Own Score
+        render_b64 = state.get("render") or ""
+        render = to_array(render_b64) if render_b64 else None
+
+        if render is not None and self.reference_path and os.path.exists(self.reference_path):
+            return round(image_score(compare(render, similarity_gate.reference(self.reference_path))), 4), render
+
+        # Variants That Keep The Description In "vision" Store The Scored Comparison In "feedback"
+        return vision_score(state.get("feedback") or state.get("vision")), render
+
+    def observe(self, state):
+
+        # Record One Finished Pass, The First Pass Counts As Iteration 0
+        try:
+            score, render = self.score(state)
+        except Exception as e:
+            print(f"Error in main execution: {e}")
+            score, render = None, None
+
+        # The Feedback Vision Node Keeps The Render Of The Pass Before
+        change = None
+        previous_b64 = state.get("previous_render") or ""
+        if render is not None and previous_b64 == state.get("render"):
+            change = 0.0
+        elif render is not None and previous_b64:
+            try:
+                change = round(1 - compare(render, to_array(previous_b64))["ssim"], 4)
+            except Exception as e:
+                print(f"Error in main execution: {e}")
+
+        # Plateau: Count Iterations Without A Meaningful Improvement
+        if score is not None:
+            if self.best_score is None or score >= self.best_score + self.min_improvement:
+                self.stale = 0
+            else:
+                self.stale += 1
+            self.best_score = score if self.best_score is None else max(self.best_score, score)
+
+        # Tokens Reported By The Models For Every Call Of This Run So Far
+        self.tokens = usage_tracker.totals(state.get("run_id", ""))["total_tokens"]
+        self.history.append({
+            "iteration": len(self.history),
+            "score": score,
+            "change": change,
+            "skip_reason": state.get("skip_reason", ""),
+            "elapsed_s": round(time.time() - self.started, 1),
+        })
+
+        print(f"Loop score: {score}, render change: {change}, best: {self.best_score}, {self.tokens} tokens")
+
+    def should_continue(self):
+
+        last = self.history[-1] if self.history else {}
+        elapsed = time.time() - self.started
+        per_iteration = elapsed / len(self.history) if self.history else 0
+
+        if self.iterations >= self.max_iterations:
+            self.stop_reason = f"max iterations ({self.max_iterations})"
+        elif self.iterations < self.min_iterations:
+            return True
+        elif last.get("score") is not None and last["score"] >= self.target_score:
+            self.stop_reason = f"converged (score {last['score']} >= {self.target_score})"
+        elif last.get("skip_reason"):
+            self.stop_reason = f"converged ({last['skip_reason']})"
+        elif last.get("change") is not None and last["change"] < MIN_RENDER_CHANGE:
+            self.stop_reason = f"converged (render change {last['change']} < {MIN_RENDER_CHANGE})"
+        elif self.stale >= self.patience:
+            self.stop_reason = f"plateau (no improvement of {self.min_improvement} in {self.patience} iterations)"
+        elif self.time_budget and elapsed + per_iteration > self.time_budget:
+            self.stop_reason = f"time budget ({self.time_budget:.0f}s)"
+        elif self.token_budget and self.tokens + self.tokens / len(self.history) > self.token_budget:
+            self.stop_reason = f"token budget ({self.tokens} of {self.token_budget} tokens)"
+        else:
+            return True
+
+        return False
+
+    def next_iteration(self):
+        self.iterations += 1
+        return self.iterations
+
+    def is_last_allowed(self):
+
+        # The Iteration About To Run Is The Last One The Hard Limits Allow
+        return self.iterations + 1 >= self.max_iterations
+
+    def print_summary(self):
+
+        print("\n")
+        print(f"Feedback loop stopped after {self.iterations} iterations: {self.stop_reason}")
+        for entry in self.history:
+            print(f"  iteration {entry['iteration']}: score {entry['score']}, change {entry['change']}, {entry['elapsed_s']}s")
+        print("\n")
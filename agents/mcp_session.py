@@ -0,0 +1,196 @@
+from langchain_mcp_adapters.client import MultiServerMCPClient
+from langchain_mcp_adapters.tools import load_mcp_tools
+from mcp.shared.exceptions import McpError
+from mcp.types import CONNECTION_CLOSED
+
+import anyio
+import asyncio
+import os
+
+from asset_cache import wrap_tools
+from tracing import tracer
+
+
+# Tools That Need External Services Not Used In The Experiments
+EXCLUDED_TOOLS = {
+    "get_hyper3d_status",
+    "get_sketchfab_status",
+    "search_sketchfab_models",
+    "download_sketchfab_models",
+    "generate_hyper3d_model_via_text",
+    "generate_hyper3d_model_via_images",
+    "poll_rodin_job_status",
+    "import_generated_asset",
+}
+
+# Seconds Between Pings Of An Idle Session, A Dead Server Fails The Ping And Ends The Session
+HEARTBEAT_INTERVAL = float(os.environ.get("MCP_HEARTBEAT_INTERVAL", 15))
+
+BLENDER_MCP_CONNECTIONS = {
+    "blender_mcp": {
+        "command": "uvx",
+        "args": ["blender-mcp"],
+        "transport": "stdio",
+    }
+}
+
+
+def is_transport_error(error):
+
+    # The Stdio Server Or Its Pipes Are Gone, As Opposed To A Tool Reporting A Failure
+    if isinstance(error, (anyio.ClosedResourceError, anyio.BrokenResourceError, anyio.EndOfStream, ConnectionError)):
+        return True
+    if isinstance(error, McpError):
+        return error.error.code == CONNECTION_CLOSED
+
+    return any(is_transport_error(inner) for inner in getattr(error, "exceptions", ()))
+
+
+class BlenderMCPSession:
+
+    # Keep One Stdio Blender-MCP Server Alive For The Whole Run
+    def __init__(self, connections=None, server_name="blender_mcp", max_retries=3):
+        self.client = MultiServerMCPClient(connections or BLENDER_MCP_CONNECTIONS)
+        self.server_name = server_name
+        self.max_retries = max_retries
+
+        self.session = None
+        self.tools = []
+        self.error = None
+
+        self._runner = None
+        self._ready = None
+        self._stop = None
+        self._lock = asyncio.Lock()
+
+    async def _serve(self):
+
+        # Enter And Leave The Session In The Same Task, The Stdio Transport Requires It
+        try:
+            async with self.client.session(self.server_name) as session:
+                # Polyhaven Imports Go Through The Local Asset Cache When It Is Enabled, Every Call Gets A Trace Span
+                self.tools = tracer.instrument(wrap_tools(await load_mcp_tools(session), self))
+                self.session = session
+                self._ready.set()
+
+                # Leave The Session When Asked To Or When The Heartbeat Finds The Server Dead
+                heartbeat = asyncio.ensure_future(self._heartbeat(session))
+                stop = asyncio.ensure_future(self._stop.wait())
+                try:
+                    await asyncio.wait({heartbeat, stop}, return_when=asyncio.FIRST_COMPLETED)
+                finally:
+                    heartbeat.cancel()
+                    stop.cancel()
+
+                if heartbeat.done() and not heartbeat.cancelled() and heartbeat.exception() is not None:
+                    print(f"Error in main execution: {heartbeat.exception()}")
+                    self.error = heartbeat.exception()
+
+        except Exception as e:
+            self.error = e
+
+        finally:
+            self.session = None
+            self._ready.set()
+
+    async def _heartbeat(self, session):
+        while True:
+            await asyncio.sleep(HEARTBEAT_INTERVAL)
+            await session.send_ping()
+
+    async def _start(self):
+
+        for attempt in range(1, self.max_retries + 1):
+            self.error = None
+            self._ready = asyncio.Event()
+            self._stop = asyncio.Event()
+            self._runner = asyncio.create_task(self._serve())
+            await self._ready.wait()
+
+            if self.session is not None:
+                print(f"Blender-MCP session ready ({len(self.tools)} tools).")
+                return
+
+            print(f"Error in main execution: {self.error}")
+            await asyncio.sleep(attempt)
+
+        raise RuntimeError(f"Could not connect to {self.server_name}: {self.error}")
+
+    async def _shutdown(self):
+
+        if self._runner is None:
+            return
+
+        self._stop.set()
+        try:
+            await self._runner
+        except Exception as e:
+            print(f"Error in main execution: {e}")
+
+        self._runner = None
+        self.session = None
+        self.tools = []
+
+    def is_alive(self):
+
+        # The Runner Leaves The Session As Soon As The Heartbeat Fails, So A Dead Server Turns This False
+        return self._runner is not None and not self._runner.done() and self.session is not None
+
+    async def open(self):
+        async with self._lock:
+            if not self.is_alive():
+                await self._start()
+        return self
+
+    async def reconnect(self, broken=None):
+        async with self._lock:
+
+            # Another Caller Already Replaced The Session That Failed
+            if broken is not None and self.session is not broken and self.is_alive():
+                return self
+
+            print("Reconnecting to Blender-MCP server.")
+            await self._shutdown()
+            await self._start()
+        return self
+
+    async def close(self):
+        async with self._lock:
+            await self._shutdown()
+
+    async def get_tools(self, filtered=True):
+
+        # Reconnect If The Server Died Between Iterations, A Ping Catches Deaths The Heartbeat Has Not Seen Yet
+        session = self.session
+        if not self.is_alive():
+            await self.reconnect()
+        else:
+            try:
+                await session.send_ping()
+            except Exception as e:
+                if not is_transport_error(e):
+                    raise
+                print(f"Error in main execution: {e}")
+                await self.reconnect(session)
+
+        if not filtered:
+            return list(self.tools)
+
+        return [t for t in self.tools if t.name not in EXCLUDED_TOOLS]
+
+    async def call_tool(self, name, arguments):
+
+        # Call One MCP Tool Directly, Without A Tool Agent, Retried Once On A Fresh Session If The Server Died
+        for attempt in range(2):
+            tools = {tool.name: tool for tool in await self.get_tools(filtered=False)}
+            if name not in tools:
+                raise KeyError(f"Tool {name} is not provided by {self.server_name}")
+
+            session = self.session
+            try:
+                return await tools[name].ainvoke(arguments)
+            except Exception as e:
+                if attempt or not is_transport_error(e):
+                    raise
+                print(f"Error in main execution: {e}")
+                await self.reconnect(session)
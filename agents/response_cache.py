@@ -0,0 +1,118 @@
+import base64
+import hashlib
+import json
+import os
+
+
+CACHE_DIR = os.environ.get("LLM_CACHE_DIR", ".llm_cache")
+MAX_BYTES = int(os.environ.get("LLM_CACHE_MAX_BYTES", 512 * 1024 * 1024))
+
+# Sampled Responses (Temperature > 0) Are Only Cached With LLM_CACHE_SAMPLED=1, Reruns Would Repeat Them
+CACHE_SAMPLED = os.environ.get("LLM_CACHE_SAMPLED", "0") == "1"
+
+
+class ResponseCache:
+
+    # Content-Addressed On-Disk Cache For Model Responses With LRU Eviction By Size
+    def __init__(self, directory=CACHE_DIR, max_bytes=MAX_BYTES, cache_sampled=CACHE_SAMPLED):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.cache_sampled = cache_sampled
+        self.enabled_nodes = set()
+        self.hits = {}
+        self.misses = {}
+
+    def enable(self, *nodes):
+        self.enabled_nodes.update(nodes)
+
+    def is_enabled(self, node, model_params=None):
+
+        # Only Deterministic Calls Are Served From The Cache Unless Sampled Ones Are Opted In
+        if node is None or node not in self.enabled_nodes:
+            return False
+        if model_params is not None and model_params.get("temperature") and not self.cache_sampled:
+            return False
+        return True
+
+    def key(self, model_params, prompt, image_b64=None):
+
+        # Hash The Decoded Image Bytes, Not The Base64 Text
+        image_hash = None
+        if image_b64:
+            image_hash = hashlib.sha256(base64.b64decode(image_b64)).hexdigest()
+
+        payload = json.dumps(
+            {"model": model_params, "prompt": prompt, "image": image_hash},
+            sort_keys=True,
+            default=str,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], key + ".json")
+
+    def get(self, node, key):
+
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+
+        except (OSError, ValueError):
+            self.misses[node] = self.misses.get(node, 0) + 1
+            return None
+
+        # Touch The Entry So Eviction Keeps Recently Used Responses
+        os.utime(path, None)
+        self.hits[node] = self.hits.get(node, 0) + 1
+        return entry["response"]
+
+    def put(self, node, key, response):
+
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        # Write Atomically So A Crash Never Leaves A Half Entry
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"node": node, "response": response}, f)
+        os.replace(tmp_path, path)
+
+        self.evict()
+
+    def evict(self):
+
+        entries = []
+        total = 0
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if not name.endswith(".json"):
+                    continue
+                path = os.path.join(root, name)
+                stat = os.stat(path)
+                entries.append((stat.st_mtime, stat.st_size, path))
+                total += stat.st_size
+
+        # Remove Least Recently Used Entries Until The Cache Fits
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            os.remove(path)
+            total -= size
+
+    def print_stats(self):
+
+        nodes = sorted(set(self.hits) | set(self.misses))
+        if not nodes:
+            return
+
+        print("\n")
+        print("Response Cache:")
+        for node in nodes:
+            print(f"{node}: {self.hits.get(node, 0)} hits, {self.misses.get(node, 0)} misses")
+        print("\n")
+
+
+# Shared Cache, Nodes Opt In With response_cache.enable(...)
+response_cache = ResponseCache()
@@ -0,0 +1,117 @@
+from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+
+import asyncio
+import os
+import time
+import uuid
+from contextlib import AsyncExitStack
+
+from checkpoints import restore_scene
+from loop_controller import MAX_ITERATIONS
+from tracing import tracer
+
+
+# Every Finished Graph Node Is Saved Here, Keyed By Run Id
+RUN_DB = os.environ.get("RUN_DB", ".runs/runs.sqlite")
+
+# Every Pass Runs At Most Six Nodes
+RECURSION_LIMIT = max(150, 6 * (MAX_ITERATIONS + 1) + 10)
+
+
+def new_run_id():
+    return time.strftime("%Y%m%d-%H%M%S") + "-" + uuid.uuid4().hex[:6]
+
+
+class RunStore:
+
+    # One SQLite Checkpointer Per Process, Shared By All Graphs And Runs
+    def __init__(self, path=RUN_DB):
+        self.path = path
+        self.saver = None
+        self.stack = None
+        self.lock = asyncio.Lock()
+
+        # Compiled Graph Per Variant
+        self.graphs = {}
+
+    async def open(self):
+        async with self.lock:
+            if self.saver is None:
+                os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+                self.stack = AsyncExitStack()
+                self.saver = await self.stack.enter_async_context(AsyncSqliteSaver.from_conn_string(self.path))
+        return self.saver
+
+    async def close(self):
+        async with self.lock:
+            if self.stack is not None:
+                await self.stack.aclose()
+            self.stack = None
+            self.saver = None
+
+    async def graph(self, name, build):
+
+        # Compile Each Variant's Graph Once Per Process, Every Run And Job Reuses It
+        saver = await self.open()
+        if name not in self.graphs or self.graphs[name].checkpointer is not saver:
+            self.graphs[name] = build().compile(checkpointer=saver)
+        return self.graphs[name]
+
+    def config(self, run_id):
+
+        # One Thread Per Run, The Limit Covers The Longest Feedback Loop
+        return {"configurable": {"thread_id": run_id}, "recursion_limit": RECURSION_LIMIT}
+
+    async def inputs(self, run_id):
+
+        # The Inputs Of A Run, Read Back From Its Saved State
+        saver = await self.open()
+        saved = await saver.aget_tuple({"configurable": {"thread_id": run_id, "checkpoint_ns": ""}})
+        if saved is None:
+            raise KeyError(f"No saved run with id {run_id} in {self.path}")
+
+        return dict(saved.checkpoint["channel_values"])
+
+    async def prune(self, run_id):
+
+        # Resuming Or Reading A Run Only Needs Its Latest Checkpoint, Every Older One Holds Its Own Base64 Renders
+        saver = await self.open()
+        latest = await saver.aget_tuple({"configurable": {"thread_id": run_id, "checkpoint_ns": ""}})
+        if latest is None:
+            return
+
+        checkpoint_id = latest.config["configurable"]["checkpoint_id"]
+        async with saver.lock:
+            for table in ("checkpoints", "writes"):
+                await saver.conn.execute(f"DELETE FROM {table} WHERE thread_id = ? AND checkpoint_id != ?", (run_id, checkpoint_id))
+            await saver.conn.commit()
+
+    async def run(self, graph, input_state, run_id):
+
+        # Start A New Run, Or Continue A Saved One From The Node That Was Running
+        config = self.config(run_id)
+        snapshot = await graph.aget_state(config)
+
+        if snapshot.values and not snapshot.next:
+            print(f"Run {run_id} already finished, loaded from {self.path}")
+            return dict(snapshot.values)
+
+        # Root Span Of The Run's Trace, A Resumed Run Appends A Second One
+        async with tracer.span("run", run_id, run_id=run_id, resumed=bool(snapshot.next)):
+            if snapshot.next:
+                print(f"Run {run_id}: resuming at {', '.join(snapshot.next)}")
+
+                # Nodes After The Last Checkpoint Start From Its Scene Again
+                await self.prune(run_id)
+                await restore_scene(snapshot.values)
+                result = await graph.ainvoke(None, config)
+            else:
+                result = await graph.ainvoke(input_state, config)
+
+        # SQLite Reuses The Freed Pages, So The File Grows By One State Per Run Instead Of One Per Node
+        await self.prune(run_id)
+        return result
+
+
+# Shared Store, Closed At The End Of main()
+run_store = RunStore()
@@ -0,0 +1,206 @@
+import ast
+import hashlib
+import os
+import re
+import textwrap
+
+from blender_render import RESET_SCENE_CODE, execute_code
+from llm_stream import extract_code
+
+
+# SCENE_DELTA=1 Applies Only The Changed Parts Of Each New Script To The Live Scene
+ENABLED = os.environ.get("SCENE_DELTA", "0") == "1"
+
+# Custom Property Holding The Chunk That Created An Object
+TAG = "scene_delta"
+
+# Calls That Put New Objects Into The Scene
+CREATES_OBJECTS = re.compile(r"bpy\.ops\.(mesh|curve|object|surface|metaball|text|light|camera|import_scene)\.|\.objects\.new\(")
+
+DEFINITIONS = (ast.Import, ast.ImportFrom, ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)
+
+# Runs Inside Blender: Remove Outdated Objects, Then Run And Tag The Changed Chunks
+# Objects Of The Agent's Full Builds Carry No Tag, A Removed Chunk Must Be Found By Tag Or Name Or Nothing Is Touched
+APPLY_CODE = textwrap.dedent("""
+    import re
+    import bpy
+
+    removed_keys = set({removed_keys!r})
+    removed_names = set({removed_names!r})
+    object_chunks = {object_chunks!r}
+    chunks = {chunks!r}
+
+    def base_name(name):
+        return re.sub(r"\\.\\d{{3}}$", "", name)
+
+    untracked = [
+        key for key, names in object_chunks
+        if not any(obj.get({tag!r}) == key or base_name(obj.name) in names for obj in bpy.data.objects)
+    ]
+    if untracked:
+        raise RuntimeError(f"objects of chunks {{untracked}} are not tagged, applying the delta would duplicate them")
+
+    removed = 0
+    for obj in list(bpy.data.objects):
+        if obj.get({tag!r}) in removed_keys or base_name(obj.name) in removed_names:
+            bpy.data.objects.remove(obj, do_unlink=True)
+            removed += 1
+
+    namespace = {{"__name__": "__main__"}}
+    created = 0
+    for key, source in chunks:
+        before = set(bpy.data.objects.keys())
+        exec(compile(source, key, "exec"), namespace)
+        for name in set(bpy.data.objects.keys()) - before:
+            bpy.data.objects[name][{tag!r}] = key
+            created += 1
+
+    print(f"Scene delta: removed {{removed}} objects, created {{created}} objects")
+    """)
+
+
+class Chunk:
+
+    # Consecutive Top-Level Statements That Belong Together In The Script
+    def __init__(self, nodes, source):
+        self.source = source
+        self.key = hashlib.sha1("".join(ast.dump(node) for node in nodes).encode("utf-8")).hexdigest()[:12]
+        self.is_definition = all(isinstance(node, DEFINITIONS) for node in nodes)
+
+        self.stores = set()
+        self.loads = set()
+        self.names = set()
+        for node in nodes:
+            if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+                self.stores.add(node.name)
+            for child in ast.walk(node):
+                if isinstance(child, ast.Name):
+                    (self.stores if isinstance(child.ctx, ast.Store) else self.loads).add(child.id)
+                elif isinstance(child, (ast.Import, ast.ImportFrom)):
+                    self.stores.update((alias.asname or alias.name).split(".")[0] for alias in child.names)
+                self.names.update(object_names(child))
+
+        self.creates_objects = bool(CREATES_OBJECTS.search(source))
+
+
+def object_names(node):
+
+    # Names Given To Objects: obj.name = "Tree" Or ...new(name="Tree", ...)
+    names = set()
+    if isinstance(node, ast.Assign) and isinstance(node.value, ast.Constant) and isinstance(node.value.value, str):
+        if any(isinstance(target, ast.Attribute) and target.attr == "name" for target in node.targets):
+            names.add(node.value.value)
+
+    if isinstance(node, ast.Call):
+        for keyword in node.keywords:
+            if keyword.arg == "name" and isinstance(keyword.value, ast.Constant) and isinstance(keyword.value.value, str):
+                names.add(keyword.value.value)
+
+        # bpy.data.objects.new("Tree", mesh)
+        func = node.func
+        if isinstance(func, ast.Attribute) and func.attr == "new" and node.args:
+            owner = func.value
+            if isinstance(owner, ast.Attribute) and owner.attr == "objects":
+                first = node.args[0]
+                if isinstance(first, ast.Constant) and isinstance(first.value, str):
+                    names.add(first.value)
+
+    return names
+
+
+def split_chunks(code):
+
+    # A New Chunk Starts After A Blank Or Comment Line, And Around Imports And Definitions
+    tree = ast.parse(code)
+    lines = code.splitlines()
+
+    groups = []
+    previous_end = 0
+    for node in tree.body:
+        start = min([node.lineno] + [d.lineno for d in getattr(node, "decorator_list", [])]) - 1
+        gap = lines[previous_end:start]
+        boundary = (
+            not groups
+            or any(not line.strip() or line.strip().startswith("#") for line in gap)
+            or isinstance(node, DEFINITIONS)
+            or isinstance(groups[-1][-1], DEFINITIONS)
+        )
+        if boundary:
+            groups.append([])
+        groups[-1].append(node)
+        previous_end = node.end_lineno
+
+    chunks = []
+    for nodes in groups:
+        start = min([nodes[0].lineno] + [d.lineno for d in getattr(nodes[0], "decorator_list", [])]) - 1
+        source = "\n".join(lines[start:nodes[-1].end_lineno])
+        chunks.append(Chunk(nodes, source))
+
+    return chunks
+
+
+def plan_delta(previous_code, code):
+
+    # Compare The Chunks Of The Script The Scene Was Built From With The New Script
+    old_chunks = split_chunks(previous_code)
+    new_chunks = split_chunks(code)
+    old_keys = {chunk.key for chunk in old_chunks}
+    new_keys = {chunk.key for chunk in new_chunks}
+
+    removed = [chunk for chunk in old_chunks if chunk.key not in new_keys]
+    added = [chunk for chunk in new_chunks if chunk.key not in old_keys]
+
+    # Changed Chunks May Need Variables From Unchanged Ones
+    run = {chunk.key for chunk in added}
+    needed = set().union(*(chunk.loads for chunk in added)) if added else set()
+    for chunk in reversed(new_chunks):
+        if chunk.key in run or not (chunk.stores & needed):
+            continue
+
+        # Re-Running A Chunk That Builds Objects Would Duplicate Them, Rebuild Everything Instead
+        if chunk.creates_objects:
+            return old_chunks, new_chunks, True
+
+        run.add(chunk.key)
+        needed |= chunk.loads
+
+    # Keep The Script Order, Imports Are Always Cheap To Repeat
+    to_run = [chunk for chunk in new_chunks if chunk.key in run or chunk.is_definition]
+    return removed, to_run, False
+
+
+async def apply(session, previous_text, text):
+
+    # Raises If Either Script Has No Usable Code Or Blender Reports An Error
+    previous_code = extract_code(previous_text) or previous_text
+    code = extract_code(text)
+    if code is None:
+        raise ValueError("the new response has no complete code block")
+
+    removed, to_run, full_rebuild = plan_delta(previous_code, code)
+    if full_rebuild:
+        print("Scene delta: changed chunks depend on object-building chunks, rebuilding all script objects.")
+
+    print(f"Scene delta: {len(removed)} chunks removed, {len(to_run)} chunks to run.")
+    if not removed and all(chunk.is_definition for chunk in to_run):
+        return "Scene delta: script unchanged, nothing to apply."
+
+    script = APPLY_CODE.format(
+        removed_keys=sorted(chunk.key for chunk in removed),
+        removed_names=sorted(set().union(*(chunk.names for chunk in removed))) if removed else [],
+        object_chunks=[(chunk.key, sorted(chunk.names)) for chunk in removed if chunk.creates_objects],
+        chunks=[(chunk.key, chunk.source) for chunk in to_run],
+        tag=TAG,
+    )
+
+    try:
+        return str(await execute_code(session, script))
+
+    except Exception:
+        # The Caller Falls Back To The Full Script, Which Must Not Build On A Half-Applied Or Untracked Scene
+        print("Scene delta: clearing the scene before the full script runs.")
+        try:
+            await execute_code(session, RESET_SCENE_CODE)
+        except Exception as e:
+            print(f"Error in main execution: {e}")
+        raise
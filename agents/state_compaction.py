@@ -0,0 +1,186 @@
+import json
+import os
+import re
+from functools import wraps
+
+from llm_stream import chunk_text, extract_code, strip_think
+from usage_tracker import CHARS_PER_TOKEN
+
+
+# STATE_COMPACTION=1 Or 0 Turns Trimming On Or Off For Every Variant
+# Unset, The Variant Decides: On For Ollama, Whose Default Context Cuts Long Prompts Off Silently, Off For Gemini
+SETTING = os.environ.get("STATE_COMPACTION", "")
+
+# Token Budget Per Node For Each State Field Its Prompt Is Built From
+# Sized For Ollama's Default Context Of A Few Thousand Tokens, Longer Prompts Are Cut Off Silently There
+NODE_BUDGETS = {
+    "vision_llm": {"vision": 800, "description": 1000},
+    "plan_llm": {"vision": 1200},
+    "code_llm": {"vision": 800, "plan": 1000, "code": 2500, "error": 300},
+    "tools_llm": {"vision": 800, "plan": 1000, "code": 2500, "error": 300},
+    "gemini_llm": {"vision": 4000},
+}
+
+# COMPACT_BUDGETS='{"code_llm": {"plan": 1500}}' Overrides Single Budgets
+for node, budgets in json.loads(os.environ.get("COMPACT_BUDGETS", "{}")).items():
+    NODE_BUDGETS.setdefault(node, {}).update(budgets)
+
+LIST_LINE = re.compile(r"^\s*(?:[-*+•]|\d+[.)]|#+)\s+")
+SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+# Tool Messages Kept From A ReAct Result
+ERROR_MESSAGES = 4
+
+
+def count_tokens(text):
+    return -(-len(text) // CHARS_PER_TOKEN)
+
+
+def clean_text(text):
+
+    # Drop Reasoning, Repeated Lines And Runs Of Blank Lines
+    lines = []
+    seen = set()
+    for line in strip_think(text).splitlines():
+        key = line.strip()
+        if key and key in seen:
+            continue
+        seen.add(key)
+        lines.append(line.rstrip())
+
+    return re.sub(r"\n{3,}", "\n\n", "\n".join(lines)).strip()
+
+
+def cut_sentences(text, budget):
+
+    # Longest Run Of Whole Sentences That Fits
+    kept = ""
+    for sentence in SENTENCE_END.split(text):
+        candidate = (kept + " " + sentence).strip()
+        if count_tokens(candidate) > budget:
+            break
+        kept = candidate
+
+    return kept or text[:budget * CHARS_PER_TOKEN]
+
+
+def trim_text(text, budget):
+
+    # Keep The Opening Overview And The Listed Items, They Carry The Assets And Differences
+    text = clean_text(text)
+    if count_tokens(text) <= budget:
+        return text
+
+    paragraphs = [paragraph for paragraph in text.split("\n\n") if paragraph.strip()]
+    lines = [(index, line) for index, paragraph in enumerate(paragraphs) for line in paragraph.splitlines()]
+
+    keep = {0: cut_sentences(paragraphs[0], budget)}
+    used = count_tokens(keep[0])
+
+    # Fill Up With List Lines First, Then Whole Paragraphs In Their Order
+    picked_lines = []
+    for index, line in lines:
+        if index > 0 and LIST_LINE.match(line) and used + count_tokens(line) <= budget:
+            picked_lines.append((index, line))
+            used += count_tokens(line)
+    for index, paragraph in enumerate(paragraphs[1:], start=1):
+        if any(picked_index == index for picked_index, _ in picked_lines):
+            continue
+        if used + count_tokens(paragraph) <= budget:
+            keep[index] = paragraph
+            used += count_tokens(paragraph)
+
+    for index, line in picked_lines:
+        keep[index] = (keep[index] + "\n" + line) if index in keep else line
+
+    return "\n\n".join(keep[index] for index in sorted(keep)) + "\n\n[...]"
+
+
+def trim_code(text, budget):
+
+    # Only The Prose Around The Script Goes, The Code Itself Is Never Cut Or Deduplicated
+    code = extract_code(text)
+    if code is None:
+        return text
+
+    return "```python\n" + code.strip("\n") + "\n```"
+
+
+def error_text(value):
+
+    # The ReAct Result Is A Message List, Only The Latest Tool Outputs Tell What Failed
+    if isinstance(value, dict) and "messages" in value:
+        return "\n".join(chunk_text(getattr(message, "content", None) or str(message)) for message in value["messages"][-ERROR_MESSAGES:])
+    return str(value)
+
+
+def trim_error(value, budget):
+
+    # Errors Are Reported Last, Keep The Tail
+    text = clean_text(error_text(value))
+    if count_tokens(text) <= budget:
+        return text
+
+    return "[...]\n" + text[-budget * CHARS_PER_TOKEN:]
+
+
+TRIMMERS = {
+    "vision": trim_text,
+    "description": trim_text,
+    "plan": trim_text,
+    "code": trim_code,
+    "error": trim_error,
+}
+
+
+def compact(state, node):
+
+    # Copy Of The State With Every Field The Node Reads Brought Down To Its Budget, The State Itself Is Not Touched
+    budgets = NODE_BUDGETS.get(node, {})
+    view = dict(state)
+    trimmed = {}
+    report = []
+    for field, budget in budgets.items():
+        value = state.get(field)
+        if not value:
+            continue
+
+        before = count_tokens(value if isinstance(value, str) else error_text(value))
+        if before <= budget and isinstance(value, str):
+            continue
+
+        view[field] = trimmed[field] = TRIMMERS[field](value, budget)
+        after = count_tokens(view[field])
+        if after != before:
+            report.append(f"{field} {before} -> {after}")
+
+    if report:
+        print(f"State compaction for {node}: {', '.join(report)} tokens")
+
+    return view, trimmed
+
+
+def is_enabled(default):
+    return SETTING == "1" if SETTING in ("0", "1") else default
+
+
+def compacted(node, func, default=False):
+
+    # The Node Builds Its Prompt From Trimmed Copies, Checkpoints And Later Nodes Keep The Full Text
+    enabled = is_enabled(default)
+
+    @wraps(func)
+    async def wrapper(state):
+        if not enabled:
+            return await func(state)
+
+        view, trimmed = compact(state, node)
+        result = await func(view)
+
+        # Fields The Node Did Not Overwrite Go Back To Their Full Text
+        for field, value in trimmed.items():
+            if result.get(field) is value:
+                result[field] = state[field]
+        return result
+
+    return wrapper
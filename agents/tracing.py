@@ -0,0 +1,248 @@
+from langchain_core.callbacks import BaseCallbackHandler
+
+import argparse
+import asyncio
+import json
+import os
+import time
+import uuid
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+
+# TRACING=0 Writes No Spans
+ENABLED = os.environ.get("TRACING", "1") == "1"
+
+# One JSONL File Per Run, One Span Per Line
+TRACE_DIR = os.environ.get("TRACE_DIR", ".runs/traces")
+
+# (Run Id, Span Id) Of The Innermost Open Span, Calls Made Inside It Become Its Children
+current_span = ContextVar("current_span", default=("", None))
+
+
+def new_span_id():
+    return uuid.uuid4().hex[:16]
+
+
+def text_size(value):
+    return len(value) if isinstance(value, str) else len(json.dumps(value, default=str))
+
+
+class TraceHandler(BaseCallbackHandler):
+
+    # Spans For Every Chat Model Call, Which Includes Each ReAct Step, And Every MCP Tool Call
+    run_inline = True
+
+    def __init__(self, tracer, provider=None, model=None):
+        self.tracer = tracer
+        self.provider = provider
+        self.model = model
+        self.open = {}
+
+    def start(self, run_id, kind, name, **attributes):
+        scope_run, parent_id = current_span.get()
+        self.open[run_id] = {
+            "run_id": scope_run,
+            "span_id": new_span_id(),
+            "parent_id": parent_id,
+            "kind": kind,
+            "name": name,
+            "start": time.time(),
+            "attributes": attributes,
+        }
+
+    def end(self, run_id, status, **attributes):
+        span = self.open.pop(run_id, None)
+        if span is None:
+            return
+
+        span["attributes"].update(attributes)
+        self.tracer.emit(span, status)
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        self.start(run_id, "llm", self.model, provider=self.provider, messages=len(messages[0]) if messages else 0)
+
+    def on_llm_new_token(self, token, *, run_id, **kwargs):
+        span = self.open.get(run_id)
+        if span is not None and "ttft_s" not in span["attributes"]:
+            span["attributes"]["ttft_s"] = round(time.time() - span["start"], 3)
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        generations = response.generations[0] if response.generations else []
+        self.end(run_id, "ok", output_chars=sum(len(getattr(generation, "text", "") or "") for generation in generations),
+                 tool_calls=sum(len(getattr(getattr(generation, "message", None), "tool_calls", None) or []) for generation in generations))
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+
+        # Streams Closed Before Their End Report Here Too
+        self.end(run_id, "stopped" if isinstance(error, GeneratorExit) else "error", error=str(error)[:200])
+
+    def on_tool_start(self, serialized, input_str, *, run_id, **kwargs):
+        name = (serialized or {}).get("name") or kwargs.get("name") or "tool"
+        self.start(run_id, "tool", name, args_size=text_size(kwargs.get("inputs") or input_str))
+
+    def on_tool_end(self, output, *, run_id, **kwargs):
+        self.end(run_id, "ok", result_size=text_size(getattr(output, "content", output)))
+
+    def on_tool_error(self, error, *, run_id, **kwargs):
+        self.end(run_id, "error", error=str(error)[:200])
+
+
+class Tracer:
+
+    # Collects Finished Spans And Appends Them To The Run's File From A Background Task
+    def __init__(self, directory=TRACE_DIR, enabled=ENABLED):
+        self.directory = directory
+        self.enabled = enabled
+        self.queue = None
+        self.writer = None
+        self.tools_handler = TraceHandler(self)
+
+    def handler(self, provider, model):
+        return TraceHandler(self, provider, model)
+
+    def instrument(self, tools):
+
+        # MCP Tools Report To The Tracer, The Agents And Direct Calls Use Them Unchanged
+        if self.enabled:
+            for tool in tools:
+                tool.callbacks = list(tool.callbacks or []) + [self.tools_handler]
+        return tools
+
+    def path(self, run_id):
+        return os.path.join(self.directory, f"{run_id}.jsonl")
+
+    def emit(self, span, status="ok"):
+
+        if not self.enabled or not span["run_id"]:
+            return
+
+        span["end"] = time.time()
+        span["duration_s"] = round(span["end"] - span["start"], 4)
+        span["status"] = status
+
+        # Never Blocks The Node, Writing Happens In The Background
+        if self.queue is None:
+            self.queue = asyncio.Queue()
+            self.writer = asyncio.ensure_future(self.write())
+        self.queue.put_nowait(span)
+
+    async def write(self):
+
+        while True:
+            spans = [await self.queue.get()]
+            while not self.queue.empty():
+                spans.append(self.queue.get_nowait())
+
+            finished = None in spans
+            spans = [span for span in spans if span is not None]
+            if spans:
+                try:
+                    await asyncio.to_thread(self.append, spans)
+                except Exception as e:
+                    print(f"Error in main execution: {e}")
+
+            if finished:
+                return
+
+    def append(self, spans):
+
+        os.makedirs(self.directory, exist_ok=True)
+        by_run = {}
+        for span in spans:
+            by_run.setdefault(span["run_id"], []).append(json.dumps(span, default=str))
+
+        for run_id, lines in by_run.items():
+            with open(self.path(run_id), "a", encoding="utf-8") as f:
+                f.write("\n".join(lines) + "\n")
+
+    @asynccontextmanager
+    async def span(self, kind, name, run_id=None, **attributes):
+
+        # Span Around A Block, The Yielded Attributes Can Still Be Filled In
+        scope_run, parent_id = current_span.get()
+        span = {
+            "run_id": run_id or scope_run,
+            "span_id": new_span_id(),
+            "parent_id": parent_id,
+            "kind": kind,
+            "name": name,
+            "start": time.time(),
+            "attributes": attributes,
+        }
+        token = current_span.set((span["run_id"], span["span_id"]))
+        status = "ok"
+        try:
+            yield span["attributes"]
+        except BaseException as e:
+            status = "error"
+            span["attributes"]["error"] = str(e)[:200]
+            raise
+        finally:
+            current_span.reset(token)
+            self.emit(span, status)
+
+    async def close(self):
+
+        # Flush Every Queued Span Before The Event Loop Ends
+        if self.writer is not None:
+            self.queue.put_nowait(None)
+            await self.writer
+        self.queue = None
+        self.writer = None
+
+
+def traced(node, func):
+
+    # Graph Node Running Inside Its Own Span, Below The Run's Span
+    @wraps(func)
+    async def wrapper(state):
+        async with tracer.span("node", node, run_id=state.get("run_id", ""), iteration=state.get("iterations", 0)):
+            return await func(state)
+
+    return wrapper
+
+
+def to_chrome_trace(path):
+
+    # Chrome Trace Event Format, Opens In chrome://tracing And ui.perfetto.dev
+    events = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            span = json.loads(line)
+            events.append({
+                "name": span["name"] or span["kind"],
+                "cat": span["kind"],
+                "ph": "X",
+                "ts": int(span["start"] * 1_000_000),
+                "dur": int(span["duration_s"] * 1_000_000),
+                "pid": span["run_id"],
+                "tid": span["kind"],
+                "args": dict(span["attributes"], span_id=span["span_id"], parent_id=span["parent_id"], status=span["status"]),
+            })
+
+    output_path = os.path.splitext(path)[0] + ".trace.json"
+    with open(output_path, "w", encoding="utf-8") as f:
+        json.dump({"traceEvents": events}, f)
+
+    return output_path
+
+
+# Shared Tracer, Closed At The End Of main()
+tracer = Tracer()
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description="Convert a run's JSONL trace for a timeline viewer")
+    parser.add_argument("trace", help="JSONL trace file of one run")
+    args = parser.parse_args()
+
+    print(f"Chrome trace written to {to_chrome_trace(args.trace)}")
+
+
+if __name__ == "__main__":
+    main()
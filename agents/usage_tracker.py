@@ -0,0 +1,266 @@
+from langchain_core.callbacks import BaseCallbackHandler
+
+import json
+import os
+import time
+from contextvars import ContextVar
+from functools import wraps
+
+
+# One JSON File Per Run With Every Call And The Aggregates
+USAGE_DIR = os.environ.get("USAGE_DIR", ".runs/usage")
+
+# Estimate For Calls Whose Usage Never Arrived, E.g. A Cancelled Stream
+CHARS_PER_TOKEN = 4
+IMAGE_TOKENS = 258
+
+# Price In USD Per Million (Prompt, Completion) Tokens, Local Ollama Models Cost Nothing Unless Listed
+PRICES = {
+    "gemini-2.5-flash": (0.30, 2.50),
+    "gemini-2.5-pro": (1.25, 10.00),
+    "gemini-2.0-flash": (0.10, 0.40),
+}
+
+# LLM_PRICES='{"qwen3:235b": [0.2, 0.6]}' Adds Or Overrides Prices
+PRICES.update({model: tuple(price) for model, price in json.loads(os.environ.get("LLM_PRICES", "{}")).items()})
+
+# (Run Id, Node, Iteration) Of The Graph Node Currently Running
+current_scope = ContextVar("current_scope", default=("", "other", None))
+
+
+def message_size(messages):
+
+    # Characters And Images Of A Prompt, Gemini And Image Prompts Send A List Of Parts
+    chars = 0
+    images = 0
+    for message in messages:
+        content = getattr(message, "content", "")
+        if isinstance(content, str):
+            chars += len(content)
+            continue
+        for part in content:
+            if isinstance(part, str):
+                chars += len(part)
+            elif isinstance(part, dict) and part.get("type") == "text":
+                chars += len(part.get("text", ""))
+            elif isinstance(part, dict):
+                images += 1
+
+    return chars, images
+
+
+def response_usage(response):
+
+    # Ollama Reports prompt_eval_count/eval_count, Gemini Its Usage Metadata
+    prompt_tokens = completion_tokens = None
+    text = ""
+    for generation in (response.generations[0] if response is not None and response.generations else []):
+        text += getattr(generation, "text", "") or ""
+        message = getattr(generation, "message", None)
+        if message is None:
+            continue
+
+        usage = getattr(message, "usage_metadata", None) or {}
+        metadata = getattr(message, "response_metadata", None) or {}
+        prompt_tokens = usage.get("input_tokens", metadata.get("prompt_eval_count", prompt_tokens))
+        completion_tokens = usage.get("output_tokens", metadata.get("eval_count", completion_tokens))
+
+    return prompt_tokens, completion_tokens, text
+
+
+def cost(model, prompt_tokens, completion_tokens):
+    prompt_price, completion_price = PRICES.get(model, (0.0, 0.0))
+    return (prompt_tokens * prompt_price + completion_tokens * completion_price) / 1_000_000
+
+
+def aggregate(records):
+
+    ttfts = [record["ttft_s"] for record in records if record["ttft_s"] is not None]
+    return {
+        "calls": len(records),
+        "prompt_tokens": sum(record["prompt_tokens"] for record in records),
+        "completion_tokens": sum(record["completion_tokens"] for record in records),
+        "total_tokens": sum(record["prompt_tokens"] + record["completion_tokens"] for record in records),
+        "estimated_calls": sum(1 for record in records if record["estimated"]),
+        "mean_ttft_s": round(sum(ttfts) / len(ttfts), 3) if ttfts else None,
+        "latency_s": round(sum(record["latency_s"] for record in records), 3),
+        "cost_usd": round(sum(record["cost_usd"] for record in records), 6),
+    }
+
+
+class UsageHandler(BaseCallbackHandler):
+
+    # Attached To One Pooled Chat Client, Sees Every Call Of It Including The ReAct Steps
+    run_inline = True
+
+    def __init__(self, tracker, provider, model):
+        self.tracker = tracker
+        self.provider = provider
+        self.model = model
+        self.calls = {}
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        chars, images = message_size(messages[0] if messages else [])
+        self.calls[run_id] = {
+            "scope": current_scope.get(),
+            "started": time.perf_counter(),
+            "first_token": None,
+            "prompt_estimate": -(-chars // CHARS_PER_TOKEN) + images * IMAGE_TOKENS,
+        }
+
+    def on_llm_new_token(self, token, *, run_id, **kwargs):
+        call = self.calls.get(run_id)
+        if call is not None and call["first_token"] is None:
+            call["first_token"] = time.perf_counter()
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        self.finish(run_id, response, "ok")
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+
+        # A Stream Closed Before Its End Ends Up Here, With The Output So Far
+        self.finish(run_id, kwargs.get("response"), "stopped" if isinstance(error, GeneratorExit) else "error")
+
+    def finish(self, run_id, response, status):
+
+        call = self.calls.pop(run_id, None)
+        if call is None:
+            return
+
+        ended = time.perf_counter()
+        prompt_tokens, completion_tokens, text = response_usage(response)
+        estimated = prompt_tokens is None or completion_tokens is None
+        if prompt_tokens is None:
+            prompt_tokens = call["prompt_estimate"]
+        if completion_tokens is None:
+            completion_tokens = -(-len(text) // CHARS_PER_TOKEN)
+
+        scope_run, node, iteration = call["scope"]
+        self.tracker.add({
+            "run_id": scope_run,
+            "node": node,
+            "iteration": iteration,
+            "provider": self.provider,
+            "model": self.model,
+            "status": status,
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "estimated": estimated,
+            "ttft_s": round(call["first_token"] - call["started"], 3) if call["first_token"] is not None else None,
+            "latency_s": round(ended - call["started"], 3),
+            "cost_usd": round(cost(self.model, prompt_tokens, completion_tokens), 6),
+        })
+
+
+class UsageTracker:
+
+    # Token, Latency And Cost Of Every LLM Call, Grouped By Run
+    def __init__(self, directory=USAGE_DIR):
+        self.directory = directory
+        self.runs = {}
+
+    def handler(self, provider, model):
+        return UsageHandler(self, provider, model)
+
+    def path(self, run_id):
+        return os.path.join(self.directory, f"{run_id}.json")
+
+    def records(self, run_id):
+
+        # A Resumed Run Continues The Calls Saved Before It Stopped
+        if run_id not in self.runs:
+            self.runs[run_id] = []
+            if run_id:
+                try:
+                    with open(self.path(run_id), "r", encoding="utf-8") as f:
+                        self.runs[run_id] = json.load(f)["calls"]
+                except (OSError, ValueError, KeyError):
+                    pass
+        return self.runs[run_id]
+
+    def add(self, record):
+        self.records(record["run_id"]).append(record)
+
+    def totals(self, run_id):
+        return aggregate(self.records(run_id))
+
+    def report(self, run_id):
+
+        records = self.records(run_id)
+        nodes = {}
+        iterations = {}
+        for record in records:
+            nodes.setdefault(record["node"], []).append(record)
+            iterations.setdefault(str(record["iteration"]), []).append(record)
+
+        return {
+            "run_id": run_id,
+            "total": aggregate(records),
+            "nodes": {node: aggregate(group) for node, group in nodes.items()},
+            "iterations": {iteration: aggregate(group) for iteration, group in iterations.items()},
+            "calls": records,
+        }
+
+    def save(self, run_id):
+
+        if not run_id or not self.records(run_id):
+            return None
+
+        path = self.path(run_id)
+        os.makedirs(self.directory, exist_ok=True)
+
+        # Write Atomically So A Crash Never Leaves A Half File
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.report(run_id), f, indent=2)
+        os.replace(tmp_path, path)
+
+        return path
+
+    def print_summary(self, run_id):
+
+        report = self.report(run_id)
+        if not report["calls"]:
+            return
+
+        header = f"{'':<16}{'calls':>7}{'prompt':>10}{'completion':>12}{'ttft s':>9}{'latency s':>11}{'cost $':>11}"
+
+        def row(name, entry):
+            ttft = f"{entry['mean_ttft_s']:.2f}" if entry["mean_ttft_s"] is not None else "-"
+            return (f"{name:<16}{entry['calls']:>7}{entry['prompt_tokens']:>10}{entry['completion_tokens']:>12}"
+                    f"{ttft:>9}{entry['latency_s']:>11.1f}{entry['cost_usd']:>11.4f}")
+
+        print("\n")
+        print(f"LLM Usage for run {run_id}:")
+        print(header)
+        for node, entry in sorted(report["nodes"].items(), key=lambda item: -item[1]["latency_s"]):
+            print(row(node, entry))
+        print("-" * len(header))
+        for iteration, entry in sorted(report["iterations"].items(), key=lambda item: int(item[0]) if item[0].isdigit() else -1):
+            print(row(f"iteration {iteration}", entry))
+        print("-" * len(header))
+        print(row("total", report["total"]))
+        if report["total"]["estimated_calls"]:
+            print(f"{report['total']['estimated_calls']} calls without reported usage were estimated")
+        print(f"Saved to {self.save(run_id)}")
+        print("\n")
+
+
+def metered(node, func):
+
+    # Graph Node Whose LLM Calls Are Booked On Its Run, Name And Iteration
+    @wraps(func)
+    async def wrapper(state):
+        run_id = state.get("run_id", "")
+        token = current_scope.set((run_id, node, state.get("iterations", 0)))
+        try:
+            return await func(state)
+        finally:
+            current_scope.reset(token)
+            usage_tracker.save(run_id)
+
+    return wrapper
+
+
+# Shared Tracker, Every Pooled Chat Client Reports To It
+usage_tracker = UsageTracker()
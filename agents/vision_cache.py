@@ -0,0 +1,127 @@
+from PIL import Image
+
+import hashlib
+import json
+import os
+import time
+
+from llm_pool import describe
+
+
+# Kept Outside The Response Cache Directory, Its Size-Based Eviction Would Delete The Index
+VISION_CACHE_FILE = os.environ.get("VISION_CACHE_FILE", os.path.join(".vision_cache", "vision_index.json"))
+MAX_DISTANCE = int(os.environ.get("VISION_CACHE_MAX_DISTANCE", 6))
+MAX_ENTRIES = 1000
+
+
+def dhash(pil_image, size=8):
+
+    # JPEG Files Are Reopened In Draft Mode, A Cheap Reduced-Scale Decode That Leaves The Caller's Image Undecoded
+    filename = getattr(pil_image, "filename", "")
+    if pil_image.format == "JPEG" and filename and os.path.exists(filename):
+        with Image.open(filename) as draft_image:
+            draft_image.draft("L", (size * 8, size * 8))
+            small = draft_image.convert("L").resize((size + 1, size), Image.LANCZOS)
+    else:
+        small = pil_image.convert("L").resize((size + 1, size), Image.LANCZOS)
+
+    # Difference Hash: Compare Neighbouring Pixels Of A Tiny Grayscale Copy
+    pixels = list(small.getdata())
+
+    bits = 0
+    for row in range(size):
+        for col in range(size):
+            left = pixels[row * (size + 1) + col]
+            right = pixels[row * (size + 1) + col + 1]
+            bits = (bits << 1) | (1 if left > right else 0)
+
+    return bits
+
+
+def hamming(a, b):
+    return bin(a ^ b).count("1")
+
+
+def scope(chat, prompt):
+
+    # Descriptions Are Only Reused For The Same Model And Prompt
+    payload = json.dumps({"model": describe(chat), "prompt": prompt}, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class VisionCache:
+
+    # Reuse Vision Descriptions For Re-Saved, Resized Or Recompressed Reference Images
+    def __init__(self, path=VISION_CACHE_FILE, max_distance=MAX_DISTANCE):
+        self.path = path
+        self.max_distance = max_distance
+        self.entries = None
+
+    def _load(self):
+
+        if self.entries is not None:
+            return
+
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                self.entries = json.load(f)
+
+        except (OSError, ValueError):
+            self.entries = []
+
+    def _save(self):
+
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.entries, f)
+        os.replace(tmp_path, self.path)
+
+    def lookup(self, image_hash, scope_key):
+
+        # The Caller Hashes The Image Once And Passes The Same Hash To store()
+        self._load()
+
+        best = None
+        for entry in self.entries:
+            if entry["scope"] != scope_key:
+                continue
+            distance = hamming(image_hash, int(entry["hash"], 16))
+            if distance <= self.max_distance and (best is None or distance < best[0]):
+                best = (distance, entry)
+
+        if best is None:
+            return None
+
+        distance, entry = best
+        entry["last_used"] = time.time()
+        self._save()
+
+        print("\n")
+        print(f"ImageLLM Output (near-duplicate image, hamming distance {distance}):")
+        print("\n")
+        print(entry["vision"])
+        print("\n")
+
+        return entry["vision"]
+
+    def store(self, image_hash, scope_key, vision):
+
+        self._load()
+        self.entries.append({
+            "hash": format(image_hash, "016x"),
+            "scope": scope_key,
+            "vision": vision,
+            "last_used": time.time(),
+        })
+
+        # Keep The Most Recently Used Descriptions
+        if len(self.entries) > MAX_ENTRIES:
+            self.entries.sort(key=lambda entry: entry["last_used"])
+            self.entries = self.entries[-MAX_ENTRIES:]
+
+        self._save()
+
+
+# Shared Vision Cache For First-Pass Reference Images
+vision_cache = VisionCache()